@@ -1,8 +1,18 @@
+# Imported first so the startup clock includes the imports below. Services are built
+# lazily by the registry, so importing the app stays cheap
+from service_registry import registry, startup_timings, mark_startup_phase
 import os
+import click
 import logging
+import threading
 from flask import Flask, request, render_template, jsonify
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import DeclarativeBase
+from update_dispatcher import UpdateDispatcher
+
+mark_startup_phase("import_flask")
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -27,15 +37,68 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
 }
 db.init_app(app)
 
-# Import these after db is defined to avoid circular imports
-from bot_handler import TelegramBotHandler
-from prediction_service import PredictionService
+# Count the queries run per thread while handling each request or update, so N+1
+# patterns show up in the debug log (services may push nested app contexts, so this
+# can't live on flask.g)
+_query_counter = threading.local()
+
+@event.listens_for(Engine, "before_cursor_execute")
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    _query_counter.count = getattr(_query_counter, 'count', 0) + 1
+
+def reset_query_count():
+    """Start counting the queries of a new unit of work on this thread."""
+    _query_counter.count = 0
+
+def log_query_count(label):
+    """Log how many queries this thread ran since reset_query_count()."""
+    logger.debug(f"{label}: {getattr(_query_counter, 'count', 0)} database queries")
+
+@app.before_request
+def start_query_count():
+    reset_query_count()
+
+@app.teardown_request
+def finish_query_count(exception=None):
+    log_query_count(request.path)
+
+mark_startup_phase("init_app")
+
+def get_bot_handler():
+    """Get the process-wide Telegram bot handler."""
+    return registry.get('bot_handler')
+
+# Optionally pre-generate all daily predictions ahead of the midnight rollover
+if os.environ.get("PREDICTION_WARMUP_ENABLED", "false").lower() == "true":
+    registry.get('prediction_service').start_warmup_scheduler(
+        os.environ.get("PREDICTION_WARMUP_TIME", "23:30"))
+
+# Optionally refresh scraped game data in the background ahead of its expiry
+if os.environ.get("CATALOG_REFRESH_ENABLED", "false").lower() == "true":
+    registry.get('catalog_refresher').start_scheduler(
+        float(os.environ.get("CATALOG_REFRESH_INTERVAL", 3600)))
+
+# Optionally process webhook updates in a background worker pool so Telegram
+# gets its 200 immediately instead of waiting on OpenAI and outbound calls
+async_webhook_enabled = os.environ.get("ASYNC_WEBHOOK", "false").lower() == "true"
+update_dispatcher = None
+
+def process_update_in_background(update):
+    """Process a queued update inside an application context."""
+    reset_query_count()
+    with app.app_context():
+        get_bot_handler().handle_update(update)
+    log_query_count(f"update {update.get('update_id')}")
 
-# Initialize the Telegram bot handler
-telegram_bot_handler = TelegramBotHandler()
+if async_webhook_enabled:
+    update_dispatcher = UpdateDispatcher(
+        process_update_in_background,
+        max_queue_size=int(os.environ.get("UPDATE_QUEUE_SIZE", 1000)),
+        num_workers=int(os.environ.get("UPDATE_WORKERS", 4))
+    )
+    update_dispatcher.start()
 
-# Initialize the prediction service for direct use
-prediction_service = PredictionService()
+mark_startup_phase("start_background_services")
 
 @app.route('/')
 def index():
@@ -72,7 +135,16 @@ def webhook():
     try:
         update = request.get_json()
         logger.debug(f"Received update: {update}")
-        return telegram_bot_handler.handle_update(update)
+
+        if update_dispatcher:
+            if not isinstance(update, dict):
+                return {"status": "error", "message": "Invalid update"}, 400
+            # Reject when the queue is full so Telegram retries the update later
+            if not update_dispatcher.submit(update):
+                return {"status": "error", "message": "Update queue is full"}, 503
+            return {"status": "queued"}
+
+        return get_bot_handler().handle_update(update, webhook_reply=True)
     except Exception as e:
         logger.error(f"Error handling webhook: {e}")
         return {"status": "error", "message": str(e)}, 500
@@ -85,7 +157,7 @@ def test_prediction():
         lottery_type = request.args.get('type', 'vietnam')
         
         # Get a prediction from the service based on the selected type
-        prediction = prediction_service.get_daily_prediction(lottery_type)
+        prediction = registry.get('prediction_service').get_daily_prediction(lottery_type)
         
         # Return prediction as HTML for better display
         html = f"""
@@ -147,15 +219,31 @@ def test_prediction():
 def health():
     """Health check endpoint."""
     return {"status": "ok"}
+
+@app.route('/metrics')
+def metrics():
+    """Expose runtime metrics for monitoring."""
+    # Only report services this worker has built, metrics must not trigger construction
+    telegram_client = registry.get_if_built('telegram_client')
+    bot_handler = registry.get_if_built('bot_handler')
+    llm_gateway = registry.get_if_built('llm_gateway')
+    return jsonify({
+        "startup": {
+            "phases_ms": startup_timings,
+            "services_ms": registry.get_timings()
+        },
+        "update_dispatcher": update_dispatcher.get_metrics() if update_dispatcher else None,
+        "telegram_api": telegram_client.get_metrics() if telegram_client else None,
+        "outbound_scheduler": bot_handler.outbound.get_metrics() if bot_handler and bot_handler.outbound else None,
+        "llm": llm_gateway.get_metrics() if llm_gateway else None
+    })
     
 @app.route('/test-slot-game')
 def test_slot_game():
     """Test the PGSoft slot game information retrieval."""
     try:
-        from slot_game_service import SlotGameService
-        
-        # Initialize the service
-        slot_service = SlotGameService()
+        # Get the shared service
+        slot_service = registry.get('slot_game_service')
         
         # Get the game name from the query parameter, default to Mahjong Ways 2
         game_name = request.args.get('game', 'Mahjong Ways 2')
@@ -183,11 +271,10 @@ def test_slot_game():
 def test_mahjong():
     """Test page to display Mahjong Ways 2 information and image."""
     try:
-        from slot_game_service import SlotGameService
         import re
         
-        # Initialize the service
-        slot_service = SlotGameService()
+        # Get the shared service
+        slot_service = registry.get('slot_game_service')
         
         # Get Mahjong Ways 2 info
         game_name = request.args.get('game', 'Mahjong Ways 2')
@@ -240,6 +327,61 @@ def test_mahjong():
         traceback.print_exc()
         return f"Error: {str(e)}", 500
 
+@app.cli.command("broadcast-predictions")
+@click.option("--type", "prediction_type", default="vietnam", help="Lottery type to broadcast (vietnam, 4d, thai, indo)")
+@click.option("--run-id", default=None, help="Run identifier; rerun with the same id to resume a crashed broadcast")
+@click.option("--batch-size", default=1000, help="Subscribers queued per batch")
+@click.option("--wait/--no-wait", default=False, help="Send the queued messages from this process and wait until done")
+def broadcast_predictions(prediction_type, run_id, batch_size, wait):
+    """Queue today's prediction for every subscribed chat."""
+    outbound = registry.get('outbound_scheduler')
+    broadcast_service = registry.get('broadcast_service')
+    summary = broadcast_service.broadcast_daily_prediction(prediction_type, run_id=run_id, batch_size=batch_size)
+    click.echo(f"Queued {summary['queued']} messages for {summary['run_id']} {summary['by_language']}")
+
+    if wait:
+        outbound.start()
+        while outbound.pending_count():
+            time.sleep(1)
+        click.echo(f"Broadcast delivered: {outbound.get_metrics()['broadcast']}")
+
+@app.cli.command("migrate-user-languages")
+@click.option("--json-path", default="user_languages.json", help="Legacy preferences file to import")
+def migrate_user_languages(json_path):
+    """Import user language preferences from the legacy JSON file into the configured store."""
+    from user_preference_store import migrate_json_preferences
+    migrated = migrate_json_preferences(registry.get('language_service').preference_store, json_path)
+    click.echo(f"Migrated {migrated} language preferences from {json_path}")
+
+@app.cli.command("refresh-catalog")
+@click.option("--max-batches", default=None, type=int, help="Stop after this many batches (defaults to CATALOG_REFRESH_MAX_BATCHES)")
+@click.option("--all", "refresh_all", is_flag=True, help="Refresh every stored game, not only those due")
+def refresh_catalog(max_batches, refresh_all):
+    """Refresh stored PGSoft games that are due for a refresh."""
+    refresher = registry.get('catalog_refresher')
+    summary = refresher.refresh_due(max_batches=max_batches, refresh_age_days=0 if refresh_all else None)
+    click.echo(f"Catalog refresh: {summary}")
+
+@app.cli.command("set-webhook")
+@click.option("--url", default=None, help="Public base URL of the bot (defaults to WEBHOOK_URL or the Replit domain)")
+def set_webhook(url):
+    """Register the bot's /webhook endpoint with Telegram (run once per deployment)."""
+    webhook_url = url or os.environ.get("WEBHOOK_URL")
+    if not webhook_url:
+        # Use the Replit domain as webhook URL
+        replit_domain = os.environ.get("REPLIT_DOMAINS")
+        if replit_domain:
+            webhook_url = f"https://{replit_domain.split(',')[0]}"
+            logger.info(f"Using Replit domain as webhook URL: {webhook_url}")
+    if not webhook_url:
+        raise click.UsageError("No webhook URL: pass --url or set WEBHOOK_URL")
+
+    response_json = get_bot_handler().set_webhook(webhook_url)
+    click.echo(f"Webhook setup response: {response_json}")
+
+mark_startup_phase("register_routes")
+logger.info(f"App startup phases (ms): {startup_timings}")
+
 if __name__ == "__main__":
     # Start the Flask app
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,82 @@
+"""
+Benchmark the local lottery number engine.
+
+Generates and renders predictions for every lottery type and language over
+consecutive days with number_engine.NumberEngine and the templates from the
+translations_*.json files, reports predictions per second, and checks that
+the numbers are deterministic per day and free of patterns and duplicates.
+
+Usage:
+    python benchmarks/bench_number_engine.py [--days 1000]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import date, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from number_engine import NumberEngine, LOTTERY_LAYOUTS, is_patterned  # noqa: E402
+
+LANGUAGES = ['vi', 'en', 'th', 'zh']
+
+
+class TranslationFiles:
+    """Serves the translation templates like LanguageService.get_text, without the user preference store."""
+
+    def __init__(self):
+        self.translations = {}
+        for language_code in LANGUAGES:
+            with open(os.path.join(ROOT_DIR, f'translations_{language_code}.json'), encoding='utf-8') as f:
+                self.translations[language_code] = json.load(f)
+
+    def get_text(self, key, language_code=None):
+        return self.translations.get(language_code, {}).get(key, key)
+
+
+def check(engine, days):
+    """Check determinism and the number constraints, returning the number of predictions checked."""
+    checked = 0
+    for prediction_type in LOTTERY_LAYOUTS:
+        for day in days:
+            numbers = engine.generate(prediction_type, day)
+            assert numbers == engine.generate(prediction_type, day), "numbers differ for the same day"
+            drawn = [number for value in numbers.values() for number in (value if isinstance(value, list) else [value])]
+            assert len(drawn) == len(set(drawn)), f"duplicate numbers in {numbers}"
+            assert not any(is_patterned(number) for number in drawn), f"patterned number in {numbers}"
+            checked += 1
+    return checked
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--days', type=int, default=1000, help='Consecutive days to generate')
+    args = arg_parser.parse_args()
+
+    engine = NumberEngine(TranslationFiles(), seed='bench')
+    days = [date(2025, 1, 1) + timedelta(days=i) for i in range(args.days)]
+    print(f"checked {check(engine, days)} predictions")
+
+    print(f"{'type':<10} {'generate/s':>12} {'render/s':>12}")
+    for prediction_type in LOTTERY_LAYOUTS:
+        started = time.perf_counter()
+        for day in days:
+            engine.generate(prediction_type, day)
+        generate_rate = len(days) / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for day in days:
+            for language_code in LANGUAGES:
+                engine.render(prediction_type, language_code, day)
+        render_rate = len(days) * len(LANGUAGES) / (time.perf_counter() - started)
+        print(f"{prediction_type:<10} {generate_rate:>12.0f} {render_rate:>12.0f}")
+
+    print()
+    print(engine.render('vietnam', 'en', days[0]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Compare the HTML parser backends of the PGSoft scraper on saved pages.
+
+Parses the fixtures in benchmarks/fixtures with the original full
+html.parser tree and with every backend from page_parser that is installed,
+and reports the mean parse time per page and the peak memory of one parse.
+
+Usage:
+    python benchmarks/bench_parser.py [--iterations 50]
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+from page_parser import SoupPageParser, SelectolaxPageParser, available_backends  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+class FullTreeParser:
+    """The scraper's original approach: a full html.parser tree for every page."""
+
+    name = 'html.parser (full tree)'
+
+    def parse_game_cards(self, html):
+        soup = BeautifulSoup(html, 'html.parser')
+        cards = []
+        for card in soup.select('.game-card'):
+            link = card.find('a')
+            image = card.find('img')
+            title = card.select_one('.game-card-title')
+            cards.append({
+                'href': link.get('href') if link else None,
+                'image_src': image.get('src') if image else None,
+                'title': title.text.strip() if title else None
+            })
+        return cards
+
+    def parse_game_detail(self, html):
+        soup = BeautifulSoup(html, 'html.parser')
+        name = soup.select_one('.game-detail-title h1')
+        image = soup.select_one('.game-banner img')
+        description = soup.select_one('.game-description')
+        return {
+            'name': name.text.strip() if name else None,
+            'image_src': image.get('src') if image else None,
+            'description': description.text.strip() if description else None,
+            'info_items': [item.text for item in soup.select('.game-info-item')],
+            'features': [feature.text for feature in soup.select('.game-feature')]
+        }
+
+
+def load_fixtures():
+    """Load the saved pages as (kind, name, html) tuples."""
+    fixtures = []
+    for filename in sorted(os.listdir(FIXTURES_DIR)):
+        if not filename.endswith('.html'):
+            continue
+        with open(os.path.join(FIXTURES_DIR, filename), encoding='utf-8') as f:
+            html = f.read()
+        kind = 'list' if filename.startswith('game_list') else 'detail'
+        fixtures.append((kind, filename, html))
+    return fixtures
+
+
+def parse(parser, kind, html):
+    if kind == 'list':
+        return parser.parse_game_cards(html)
+    return parser.parse_game_detail(html)
+
+
+def measure(parser, kind, html, iterations):
+    """Return (mean ms per parse, peak KiB of one parse)."""
+    parse(parser, kind, html)
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        parse(parser, kind, html)
+    mean_ms = (time.perf_counter() - started) * 1000 / iterations
+
+    tracemalloc.start()
+    parse(parser, kind, html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return mean_ms, peak / 1024
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--iterations', type=int, default=50, help='Parses per page and backend')
+    args = arg_parser.parse_args()
+
+    parsers = [FullTreeParser()]
+    for backend in reversed(available_backends()):
+        parsers.append(SelectolaxPageParser() if backend == 'selectolax' else SoupPageParser(backend))
+
+    fixtures = load_fixtures()
+    baseline = {name: parse(parsers[0], kind, html) for kind, name, html in fixtures}
+
+    print(f"{'backend':<26} {'page':<38} {'KiB':>6} {'ms/page':>9} {'peak KiB':>9}")
+    for parser in parsers:
+        for kind, name, html in fixtures:
+            mean_ms, peak_kib = measure(parser, kind, html, args.iterations)
+            # Every backend must extract the same data as the original parser
+            same = parse(parser, kind, html) == baseline[name]
+            print(f"{parser.name:<26} {name:<38} {len(html.encode('utf-8')) / 1024:>6.1f} "
+                  f"{mean_ms:>9.2f} {peak_kib:>9.0f}{'' if same else '  (output differs!)'}")
+
+
+if __name__ == '__main__':
+    main()
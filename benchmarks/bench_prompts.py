@@ -0,0 +1,82 @@
+"""
+Microbenchmark of building the prediction prompts.
+
+Compares the old per-call approach (formatting the prompts and templates of
+all four languages of a lottery type on every generation, as the former
+generate_*_prediction methods did with their nested f-string dicts) with
+prompt_registry.PromptRegistry: compiled templates rendered for a new date,
+and the memoized prompts of the current day. Reports the mean time per call
+and the memory allocated by one call.
+
+Usage:
+    python benchmarks/bench_prompts.py [--iterations 20000]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_registry import PromptRegistry, DEFAULT_PROMPTS_DIR  # noqa: E402
+
+
+def load_raw_prompts():
+    """Load the prompt files as plain strings, as they were written inline before."""
+    raw = {}
+    for filename in os.listdir(DEFAULT_PROMPTS_DIR):
+        with open(os.path.join(DEFAULT_PROMPTS_DIR, filename), encoding='utf-8') as f:
+            raw[os.path.splitext(filename)[0]] = json.load(f)['languages']
+    return raw
+
+
+def rebuild_per_call(raw, prediction_type, language_code, date_text):
+    """The old approach: build every language's prompts, then pick one."""
+    prompts = {
+        code: {field: template.format(date=date_text) for field, template in templates.items() if field != 'error'}
+        for code, templates in raw[prediction_type].items()
+    }
+    return prompts[language_code]
+
+
+def measure(name, fn, iterations):
+    """Print the mean time per call and the memory allocated by a single call."""
+    fn(0)
+    started = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    elapsed_us = (time.perf_counter() - started) * 1e6 / iterations
+
+    tracemalloc.start()
+    fn(iterations)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<36} {elapsed_us:>10.2f} {peak / 1024:>12.1f}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--iterations', type=int, default=20000, help='Calls per approach')
+    args = arg_parser.parse_args()
+
+    raw = load_raw_prompts()
+    registry = PromptRegistry()
+    types = registry.types()
+    languages = ['vi', 'en', 'th', 'zh']
+    today = date(2025, 1, 1).strftime("%d/%m/%Y")
+    dates = [(date(2025, 1, 1) + timedelta(days=i)).strftime("%d/%m/%Y") for i in range(args.iterations + 1)]
+
+    def pick(i):
+        return types[i % len(types)], languages[(i // len(types)) % len(languages)]
+
+    print(f"{'approach':<36} {'us/call':>10} {'alloc KiB':>12}")
+    measure("rebuild all languages per call", lambda i: rebuild_per_call(raw, *pick(i), today), args.iterations)
+    measure("registry, new date every call", lambda i: registry.render(*pick(i), dates[i]), args.iterations)
+    measure("registry, same day (memoized)", lambda i: registry.render(*pick(i), today), args.iterations)
+
+
+if __name__ == '__main__':
+    main()
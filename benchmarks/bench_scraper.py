@@ -0,0 +1,218 @@
+"""
+Offline end-to-end benchmark of PGSoftScraper.
+
+Serves the recorded pages in benchmarks/fixtures from a local HTTP server
+(with ETag support and optional added latency), points the scraper at it and
+runs fetch_game_list, serial fetch_game_details and fetch_many against a
+throwaway SQLite database, including _update_game_database, plus a bulk
+upsert_games catalog import. Reports pages (or rows)/sec, parse ms/page,
+DB ms/page and the process RSS for every scenario.
+
+Usage:
+    python benchmarks/bench_scraper.py [--games 60] [--latency-ms 20] [--workers 8]
+"""
+import os
+import sys
+import time
+import hashlib
+import logging
+import argparse
+import resource
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'fixtures')
+sys.path.insert(0, ROOT_DIR)
+
+
+def load_fixtures():
+    """Load the recorded list page and detail pages."""
+    with open(os.path.join(FIXTURES_DIR, 'game_list.html'), 'rb') as f:
+        list_page = f.read()
+    detail_pages = []
+    for filename in sorted(os.listdir(FIXTURES_DIR)):
+        if filename.startswith('game_detail_'):
+            with open(os.path.join(FIXTURES_DIR, filename), 'rb') as f:
+                detail_pages.append(f.read())
+    return list_page, detail_pages
+
+
+def make_handler(list_page, detail_pages, latency):
+    """Build a request handler replaying the fixtures, one detail page per game ID."""
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(latency)
+            parts = [part for part in self.path.split('/') if part]
+            if parts[-1] == 'games':
+                body = list_page
+            else:
+                # Rotate through the recorded detail pages, renamed after the requested game
+                game_id = parts[-1]
+                template = detail_pages[int(hashlib.md5(game_id.encode()).hexdigest(), 16) % len(detail_pages)]
+                body = template.replace(b'<h1>', f'<h1>{game_id} '.encode(), 1)
+
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+
+class TimingParser:
+    """Wraps the scraper's parser backend to add up the time spent parsing."""
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.name = parser.name
+        self.elapsed = 0.0
+        self.pages = 0
+        self._lock = threading.Lock()
+
+    def _timed(self, method, html):
+        started = time.perf_counter()
+        try:
+            return method(html)
+        finally:
+            # fetch_many parses on several threads at once
+            with self._lock:
+                self.elapsed += time.perf_counter() - started
+                self.pages += 1
+
+    def parse_game_cards(self, html):
+        return self._timed(self.parser.parse_game_cards, html)
+
+    def parse_game_detail(self, html):
+        return self._timed(self.parser.parse_game_detail, html)
+
+
+class DatabaseTimer:
+    """Adds up the time spent executing statements and committing the session."""
+
+    def __init__(self, engine, session):
+        from sqlalchemy import event
+        self.elapsed = 0.0
+        self._local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self._before)
+        event.listen(engine, 'after_cursor_execute', self._after)
+
+        # Commits are not cursor executions but dominate SQLite writes
+        commit = session.commit
+
+        def timed_commit():
+            started = time.perf_counter()
+            try:
+                commit()
+            finally:
+                self.elapsed += time.perf_counter() - started
+        session.commit = timed_commit
+
+    def _before(self, *args):
+        self._local.started = time.perf_counter()
+
+    def _after(self, *args):
+        self.elapsed += time.perf_counter() - self._local.started
+
+
+def rss_mib():
+    """Peak resident set size of this process in MiB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_scenario(name, fn, pages, timing_parser, db_timer):
+    """Run one scenario and print its throughput, parse and DB cost per page."""
+    timing_parser.elapsed, timing_parser.pages = 0.0, 0
+    db_timer.elapsed = 0.0
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{name:<34} {pages:>6} {pages / elapsed:>10.1f} "
+          f"{timing_parser.elapsed * 1000 / max(timing_parser.pages, 1):>10.2f} "
+          f"{db_timer.elapsed * 1000 / pages:>8.2f} {rss_mib():>8.1f}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--games', type=int, default=60, help='Number of game detail pages to fetch')
+    arg_parser.add_argument('--list-fetches', type=int, default=10, help='Number of game list fetches')
+    arg_parser.add_argument('--latency-ms', type=float, default=20, help='Latency added to every response')
+    arg_parser.add_argument('--workers', type=int, default=8, help='fetch_many worker threads')
+    arg_parser.add_argument('--import-rows', type=int, default=5000, help='Games written by the bulk upsert scenario')
+    arg_parser.add_argument('--parser', default=None, help='Parser backend (defaults to SCRAPER_PARSER or auto)')
+    args = arg_parser.parse_args()
+
+    # Throwaway database and page cache; must be configured before the app is imported
+    work_dir = tempfile.mkdtemp(prefix='bench_scraper_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(work_dir, 'bench.db')}"
+
+    from app import app, db
+    import models  # noqa: F401
+    from page_cache import PageCache
+    from page_parser import create_page_parser
+    from pgsoft_scraper import PGSoftScraper
+    logging.disable(logging.WARNING)
+
+    list_page, detail_pages = load_fixtures()
+    server = ThreadingHTTPServer(
+        ('127.0.0.1', 0), make_handler(list_page, detail_pages, args.latency_ms / 1000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with app.app_context():
+        db.create_all()
+        timing_parser = TimingParser(create_page_parser(args.parser))
+        scraper = PGSoftScraper(
+            max_workers=args.workers,
+            page_cache=PageCache(os.path.join(work_dir, 'page_cache.db')),
+            parser=timing_parser
+        )
+        scraper.BASE_URL = f"http://127.0.0.1:{server.server_port}/en/games/"
+        db_timer = DatabaseTimer(db.engine, db.session)
+
+        game_ids = [f"pg-soft-bench-game-{i}" for i in range(args.games)]
+        serial_ids = game_ids[:max(1, args.games // 3)]
+
+        print(f"parser={timing_parser.name} latency={args.latency_ms}ms workers={args.workers}")
+        print(f"{'scenario':<34} {'pages':>6} {'pages/s':>10} {'parse ms':>10} {'db ms':>8} {'RSS MiB':>8}")
+        run_scenario("fetch_game_list", lambda: [scraper.fetch_game_list() for _ in range(args.list_fetches)],
+                     args.list_fetches, timing_parser, db_timer)
+        run_scenario("fetch_game_details (serial)", lambda: [scraper.fetch_game_details(g) for g in serial_ids],
+                     len(serial_ids), timing_parser, db_timer)
+        run_scenario("fetch_many (new games)", lambda: scraper.fetch_many(game_ids[len(serial_ids):]),
+                     len(game_ids) - len(serial_ids), timing_parser, db_timer)
+        run_scenario("fetch_many (force, unchanged)", lambda: scraper.fetch_many(game_ids, force=True),
+                     len(game_ids), timing_parser, db_timer)
+
+        import_rows = [
+            {'game_id': f"pg-soft-import-{i}", 'name': f"Import {i}", 'description': "Imported game",
+             'rtp': "96.50%", 'detail_url': f"{scraper.BASE_URL}pg-soft-import-{i}/"}
+            for i in range(args.import_rows)
+        ]
+        run_scenario("upsert_games (insert)", lambda: scraper.upsert_games(import_rows),
+                     len(import_rows), timing_parser, db_timer)
+        run_scenario("upsert_games (update)", lambda: scraper.upsert_games(import_rows),
+                     len(import_rows), timing_parser, db_timer)
+        print(f"scraper stats: {scraper.get_stats()}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
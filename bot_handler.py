@@ -1,12 +1,12 @@
 import os
 import json
 import logging
-import requests
+import threading
 from flask import jsonify
 from datetime import datetime, timedelta
-from prediction_service import PredictionService
-from slot_game_service import SlotGameService
-from language_service import LanguageService
+from outbound_scheduler import OutboundScheduler
+from service_registry import registry
+from streaming_message import StreamingMessage
 
 logger = logging.getLogger(__name__)
 
@@ -15,41 +15,61 @@ class TelegramBotHandler:
 
     def __init__(self):
         """Initialize the Telegram bot handler."""
-        self.telegram_token = os.environ.get("TELEGRAM_BOT_TOKEN")
-        if not self.telegram_token:
-            raise ValueError(
-                "TELEGRAM_BOT_TOKEN environment variable is not set")
-
-        self.telegram_api_url = f"https://api.telegram.org/bot{self.telegram_token}"
-
-        # Initialize services
-        self.prediction_service = PredictionService()
-        self.slot_game_service = SlotGameService()
-        self.language_service = LanguageService()
-
-        # Get either the provided WEBHOOK_URL or use the Replit domain
-        webhook_url = os.environ.get("WEBHOOK_URL")
-        if not webhook_url:
-            # Use the Replit domain as webhook URL
-            replit_domain = os.environ.get("REPLIT_DOMAINS")
-            if replit_domain:
-                webhook_url = f"https://{replit_domain}"
-                logger.info(
-                    f"Using Replit domain as webhook URL: {webhook_url}")
-
-        # Set the webhook if we have a URL
-        if webhook_url:
-            self.set_webhook(webhook_url)
+        # Pooled keep-alive client for all outbound Bot API calls
+        self.telegram = registry.get('telegram_client')
+
+        # Optionally send messages through a persistent, rate-limited outbound queue
+        self.outbound = None
+        if os.environ.get("OUTBOUND_SCHEDULER_ENABLED", "false").lower() == "true":
+            self.outbound = registry.get('outbound_scheduler')
+            self.outbound.start()
+
+        # When enabled, the last reply to an update is returned as a Bot API method call in the
+        # webhook response instead of a separate outbound request (tracked per handling thread)
+        self.webhook_reply_enabled = os.environ.get("TELEGRAM_WEBHOOK_REPLY", "false").lower() == "true"
+        self._request = threading.local()
+
+        # When enabled, answers generated on a cache miss are streamed into a placeholder message
+        self.streaming_enabled = os.environ.get("LLM_STREAMING_ENABLED", "false").lower() == "true"
+        self.streaming_interval = float(os.environ.get("LLM_STREAMING_INTERVAL", 0.7))
+        self.streaming_chars = int(os.environ.get("LLM_STREAMING_CHARS", 200))
+
+    # Services are shared per process and only built when a command first needs them
+
+    @property
+    def prediction_service(self):
+        return registry.get('prediction_service')
+
+    @property
+    def slot_game_service(self):
+        return registry.get('slot_game_service')
+
+    @property
+    def language_service(self):
+        return registry.get('language_service')
+
+    @property
+    def broadcast_service(self):
+        return registry.get('broadcast_service')
 
     def set_webhook(self, webhook_url):
         """Set the webhook for the Telegram bot."""
-        url = f"{self.telegram_api_url}/setWebhook"
         data = {"url": f"{webhook_url}/webhook"}
-        response = requests.post(url, data=data)
-        logger.info(f"Webhook setup response: {response.json()}")
+        response_json = self.telegram.call("setWebhook", data)
+        logger.info(f"Webhook setup response: {response_json}")
+        return response_json
 
-    def handle_update(self, update):
-        """Process incoming updates from Telegram."""
+    def handle_update(self, update, webhook_reply=False):
+        """
+        Process incoming updates from Telegram.
+        
+        Args:
+            update (dict): The Telegram update
+            webhook_reply (bool): Whether the returned response is delivered to Telegram as
+                                  the webhook HTTP response, so the final reply can be sent
+                                  in it (only when TELEGRAM_WEBHOOK_REPLY is enabled)
+        """
+        self._request.webhook_reply = webhook_reply and self.webhook_reply_enabled
         if 'message' in update:
             return self.handle_message(update['message'])
         elif 'callback_query' in update:
@@ -90,8 +110,7 @@ class TelegramBotHandler:
             }]]
         }
 
-        self.send_message(chat_id, help_text, keyboard)
-        return jsonify({"status": "success"})
+        return self.reply_message(chat_id, help_text, keyboard)
 
     def handle_command(self, chat_id, command, user_id):
         """Process commands from users."""
@@ -143,13 +162,11 @@ class TelegramBotHandler:
                 ]]
             }
             
-            # Send language selection message
-            self.send_message(chat_id, language_selection_text, language_keyboard)
-            
             # Log the start command
             logger.info(f"User {user_id} started the bot and was prompted to select a language")
             
-            return jsonify({"status": "success"})
+            # Send language selection message
+            return self.reply_message(chat_id, language_selection_text, language_keyboard)
 
         # Command for Vietnam lottery prediction - must check exact match or it will capture all du_doan variants
         elif command == '/du_doan':
@@ -157,11 +174,11 @@ class TelegramBotHandler:
             logger.info("Generating Vietnam lottery prediction")
             
             # Get today's Vietnam prediction in the user's language
-            prediction = self.prediction_service.get_daily_prediction('vietnam', language_code)
+            progress = self._streaming_message(chat_id, language_code)
+            prediction = self.prediction_service.get_daily_prediction('vietnam', language_code, progress)
 
             # Send the prediction with the inline keyboard
-            self.send_message(chat_id, prediction, promo_keyboard)
-            return jsonify({"status": "success"})
+            return self.reply_streamed(chat_id, prediction, promo_keyboard, progress)
             
         # Command for 4D (Singapore/Malaysia) lottery prediction
         elif command.startswith('/du_doan_4d'):
@@ -169,11 +186,11 @@ class TelegramBotHandler:
             logger.info("Generating 4D lottery prediction")
             
             # Get today's 4D prediction in the user's language
-            prediction = self.prediction_service.get_daily_prediction('4d', language_code)
+            progress = self._streaming_message(chat_id, language_code)
+            prediction = self.prediction_service.get_daily_prediction('4d', language_code, progress)
 
             # Send the prediction with the inline keyboard
-            self.send_message(chat_id, prediction, promo_keyboard)
-            return jsonify({"status": "success"})
+            return self.reply_streamed(chat_id, prediction, promo_keyboard, progress)
             
         # Command for Thai lottery prediction
         elif command.startswith('/du_doan_thai'):
@@ -181,11 +198,11 @@ class TelegramBotHandler:
             logger.info("Generating Thai lottery prediction")
             
             # Get today's Thai lottery prediction in the user's language
-            prediction = self.prediction_service.get_daily_prediction('thai', language_code)
+            progress = self._streaming_message(chat_id, language_code)
+            prediction = self.prediction_service.get_daily_prediction('thai', language_code, progress)
 
             # Send the prediction with the inline keyboard
-            self.send_message(chat_id, prediction, promo_keyboard)
-            return jsonify({"status": "success"})
+            return self.reply_streamed(chat_id, prediction, promo_keyboard, progress)
             
         # Command for Indonesian lottery prediction
         elif command.startswith('/du_doan_indo'):
@@ -193,11 +210,11 @@ class TelegramBotHandler:
             logger.info("Generating Indonesian lottery prediction")
             
             # Get today's Indonesian lottery prediction in the user's language
-            prediction = self.prediction_service.get_daily_prediction('indo', language_code)
+            progress = self._streaming_message(chat_id, language_code)
+            prediction = self.prediction_service.get_daily_prediction('indo', language_code, progress)
 
             # Send the prediction with the inline keyboard
-            self.send_message(chat_id, prediction, promo_keyboard)
-            return jsonify({"status": "success"})
+            return self.reply_streamed(chat_id, prediction, promo_keyboard, progress)
 
         # Command to list all PGSoft slot games
         elif command.startswith('/ds_slot'):
@@ -210,8 +227,7 @@ class TelegramBotHandler:
             else:
                 games_list = result
                 
-            self.send_message(chat_id, games_list, slot_keyboard)
-            return jsonify({"status": "success"})
+            return self.reply_message(chat_id, games_list, slot_keyboard)
 
         # Command to get information about a specific slot game
         elif command.startswith('/slotgame'):
@@ -231,21 +247,25 @@ class TelegramBotHandler:
                     else:
                         help_text = "Vui lòng nhập tên game sau lệnh /slotgame. Ví dụ: /slotgame Mahjong Ways 2"
                 
-                self.send_message(chat_id, help_text)
-                return jsonify({"status": "success"})
+                return self.reply_message(chat_id, help_text)
 
             game_name = parts[1].strip()
             # Get game info in the user's language
             logger.info(f"Getting slot game info for {game_name} in {language_code}")
-            result = self.slot_game_service.get_game_info(game_name, language_code)
+            progress = self._streaming_message(chat_id, language_code)
+            result = self.slot_game_service.get_game_info(game_name, language_code, progress)
             
             # Check if we have a dict result (new format) with image URL
             if isinstance(result, dict):
                 full_text = result.get('text', '')
                 image_url = result.get('image_url')
                 
+                if progress and progress.finish(full_text, slot_keyboard):
+                    # The text was streamed into its own message, the image follows it
+                    if image_url:
+                        self.send_photo(chat_id, image_url, f"<b>{game_name}</b>")
                 # If we have an image URL, send as photo with a brief caption, then send full text
-                if image_url:
+                elif image_url:
                     try:
                         # Extract just the first paragraph for the short caption to avoid Telegram's 1024 char limit
                         # Find name and RTP for the short caption
@@ -276,23 +296,32 @@ class TelegramBotHandler:
                 
             return jsonify({"status": "success"})
 
+        # Subscribe to the daily prediction broadcast
+        elif command.startswith('/subscribe'):
+            self.broadcast_service.subscribe(chat_id, user_id)
+            subscribed_text = self.language_service.get_text("subscribed", language_code)
+            return self.reply_message(chat_id, subscribed_text)
+            
+        # Unsubscribe from the daily prediction broadcast
+        elif command.startswith('/unsubscribe'):
+            self.broadcast_service.unsubscribe(chat_id)
+            unsubscribed_text = self.language_service.get_text("unsubscribed", language_code)
+            return self.reply_message(chat_id, unsubscribed_text)
+
         # Handle help command
         elif command.startswith('/help'):
             help_text = self.language_service.get_text("help_message", language_code)
-            self.send_message(chat_id, help_text, promo_keyboard)
-            return jsonify({"status": "success"})
+            return self.reply_message(chat_id, help_text, promo_keyboard)
             
         # Handle language selection command
         elif command.startswith('/language'):
             language_selection_text = self.language_service.get_text("language_selection", language_code)
             language_keyboard = self.language_service.get_language_selection_keyboard()
-            self.send_message(chat_id, language_selection_text, language_keyboard)
-            return jsonify({"status": "success"})
+            return self.reply_message(chat_id, language_selection_text, language_keyboard)
 
         # Handle unknown commands
         unknown_command_text = self.language_service.get_text("command_not_recognized", language_code)
-        self.send_message(chat_id, unknown_command_text)
-        return jsonify({"status": "success"})
+        return self.reply_message(chat_id, unknown_command_text)
 
     def handle_callback_query(self, callback_query):
         """Handle callback queries from inline buttons."""
@@ -357,41 +386,94 @@ class TelegramBotHandler:
             
             # Acknowledge the callback query
             if callback_id:
-                url = f"{self.telegram_api_url}/answerCallbackQuery"
-                data = {"callback_query_id": callback_id}
-                requests.post(url, data=data)
+                if self._take_webhook_reply():
+                    return self._webhook_reply("answerCallbackQuery", {"callback_query_id": callback_id})
+                self.answer_callback_query(callback_id)
             
             return jsonify({"status": "success", "message": f"Language set to {language_code}"})
         
         # For other callbacks, just acknowledge to stop the loading indicator
         if callback_id:
-            url = f"{self.telegram_api_url}/answerCallbackQuery"
-            data = {"callback_query_id": callback_id}
-            requests.post(url, data=data)
+            if self._take_webhook_reply():
+                return self._webhook_reply("answerCallbackQuery", {"callback_query_id": callback_id})
+            self.answer_callback_query(callback_id)
 
         return jsonify({"status": "success"})
 
+    def _streaming_message(self, chat_id, language_code):
+        """Create a streaming message for a reply that may need to be generated, if streaming is enabled."""
+        if not self.streaming_enabled:
+            return None
+        return StreamingMessage(
+            self.telegram,
+            chat_id,
+            self.language_service.get_text("generating_message", language_code),
+            min_interval=self.streaming_interval,
+            min_chars=self.streaming_chars
+        )
+
+    def reply_streamed(self, chat_id, text, reply_markup=None, progress=None):
+        """
+        Send the final reply to an update that may have been streamed.
+        
+        If the answer was generated into a streaming message, that message is replaced with
+        the final text; otherwise (e.g. it was cached) the reply is sent like reply_message.
+        
+        Returns:
+            Response: The webhook response for the update
+        """
+        if progress and progress.finish(text, reply_markup):
+            return jsonify({"status": "success"})
+        return self.reply_message(chat_id, text, reply_markup)
+
+    def reply_message(self, chat_id, text, reply_markup=None):
+        """
+        Send the final reply to an update.
+        
+        If allowed for the current update, the message is returned as a sendMessage call in the
+        webhook response; otherwise it is sent with an outbound request.
+        
+        Returns:
+            Response: The webhook response for the update
+        """
+        if self._take_webhook_reply():
+            payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
+            if reply_markup:
+                payload["reply_markup"] = reply_markup
+            return self._webhook_reply("sendMessage", payload)
+
+        self.send_message(chat_id, text, reply_markup)
+        return jsonify({"status": "success"})
+
+    def _take_webhook_reply(self):
+        """Check whether the current update may be answered in the webhook response (only once)."""
+        allowed = getattr(self._request, 'webhook_reply', False)
+        self._request.webhook_reply = False
+        return allowed
+
+    def _webhook_reply(self, method, payload):
+        """Build a webhook response that makes Telegram call a Bot API method."""
+        logger.debug(f"Answering update with {method} in the webhook response")
+        return jsonify({"method": method, **payload})
+
     def send_message(self, chat_id, text, reply_markup=None):
         """Send a message to a Telegram chat."""
-        url = f"{self.telegram_api_url}/sendMessage"
         data = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
 
         if reply_markup:
             data["reply_markup"] = json.dumps(reply_markup)
 
-        try:
-            response = requests.post(url, data=data)
-            response_json = response.json()
-            if not response_json.get('ok'):
-                logger.error(f"Failed to send message: {response_json}")
-            return response_json
-        except Exception as e:
-            logger.error(f"Error sending message: {e}")
-            return {"ok": False, "error": str(e)}
+        if self.outbound:
+            self.outbound.enqueue("sendMessage", data, OutboundScheduler.INTERACTIVE)
+            return {"ok": True, "queued": True}
+
+        response_json = self.telegram.call("sendMessage", data)
+        if not response_json.get('ok'):
+            logger.error(f"Failed to send message: {response_json}")
+        return response_json
 
     def send_photo(self, chat_id, photo_url, caption=None, reply_markup=None):
         """Send a photo to a Telegram chat."""
-        url = f"{self.telegram_api_url}/sendPhoto"
         data = {
             "chat_id": chat_id,
             "photo": photo_url,
@@ -404,12 +486,18 @@ class TelegramBotHandler:
         if reply_markup:
             data["reply_markup"] = json.dumps(reply_markup)
 
-        try:
-            response = requests.post(url, data=data)
-            response_json = response.json()
-            if not response_json.get('ok'):
-                logger.error(f"Failed to send photo: {response_json}")
-            return response_json
-        except Exception as e:
-            logger.error(f"Error sending photo: {e}")
-            return {"ok": False, "error": str(e)}
+        if self.outbound:
+            self.outbound.enqueue("sendPhoto", data, OutboundScheduler.INTERACTIVE)
+            return {"ok": True, "queued": True}
+
+        response_json = self.telegram.call("sendPhoto", data)
+        if not response_json.get('ok'):
+            logger.error(f"Failed to send photo: {response_json}")
+        return response_json
+
+    def answer_callback_query(self, callback_id):
+        """Acknowledge a callback query to stop the button's loading indicator."""
+        response_json = self.telegram.call("answerCallbackQuery", {"callback_query_id": callback_id})
+        if not response_json.get('ok'):
+            logger.error(f"Failed to answer callback query: {response_json}")
+        return response_json
@@ -0,0 +1,133 @@
+import json
+import time
+import logging
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models import BotSubscriber
+from outbound_scheduler import OutboundScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastService:
+    """Service for subscriptions and pushing the daily predictions to all subscribed chats."""
+
+    def __init__(self, prediction_service, language_service, outbound):
+        """
+        Initialize the broadcast service.
+
+        Args:
+            prediction_service (PredictionService): Source of the cached daily predictions
+            language_service (LanguageService): Used to look up each subscriber's language
+            outbound (OutboundScheduler): Persistent rate-limited queue the messages are sent through
+        """
+        self.prediction_service = prediction_service
+        self.language_service = language_service
+        self.outbound = outbound
+
+    def subscribe(self, chat_id, user_id):
+        """
+        Subscribe a chat to the daily broadcast.
+
+        Returns:
+            bool: True if the chat was newly subscribed, False if it already was
+        """
+        if BotSubscriber.query.filter_by(chat_id=chat_id).first():
+            return False
+        db.session.add(BotSubscriber(chat_id=chat_id, user_id=user_id))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent /subscribe from the same chat inserted it first
+            db.session.rollback()
+            return False
+        logger.info(f"Chat {chat_id} subscribed to daily predictions")
+        return True
+
+    def unsubscribe(self, chat_id):
+        """
+        Unsubscribe a chat from the daily broadcast.
+
+        Returns:
+            bool: True if the chat was subscribed
+        """
+        deleted = BotSubscriber.query.filter_by(chat_id=chat_id).delete()
+        db.session.commit()
+        if deleted:
+            logger.info(f"Chat {chat_id} unsubscribed from daily predictions")
+        return bool(deleted)
+
+    def _iter_subscriber_batches(self, after_id, batch_size):
+        """Stream subscribers in id order, one batch at a time, starting after a cursor."""
+        while True:
+            batch = (BotSubscriber.query
+                     .filter(BotSubscriber.id > after_id)
+                     .order_by(BotSubscriber.id)
+                     .limit(batch_size)
+                     .all())
+            if not batch:
+                return
+            yield batch
+            after_id = batch[-1].id
+
+    def broadcast_daily_prediction(self, prediction_type='vietnam', run_id=None, batch_size=1000,
+                                   reply_markup=None):
+        """
+        Queue today's prediction for every subscriber, grouped by language.
+
+        Each language's prediction text is fetched from the prediction cache once
+        and reused for all its subscribers. Messages are queued in batches; every
+        batch is committed to the outbound queue together with the broadcast's
+        checkpoint, so a crashed run with the same run_id resumes after the last
+        queued batch without sending anything twice.
+
+        Args:
+            prediction_type (str): The lottery type to broadcast
+            run_id (str): Identifies the run for resuming (defaults to type and date)
+            batch_size (int): Number of subscribers loaded and queued per batch
+            reply_markup (dict): Optional inline keyboard attached to every message
+
+        Returns:
+            dict: Summary with the number of queued messages per language and timings
+        """
+        today = datetime.now().date()
+        run_id = run_id or f"{prediction_type}-{today.isoformat()}"
+        cursor, already_queued = self.outbound.get_checkpoint(run_id)
+        if cursor is not None:
+            logger.info(f"Resuming broadcast {run_id} after subscriber {cursor} ({already_queued} already queued)")
+
+        started = time.monotonic()
+        texts = {}
+        queued_by_language = {}
+
+        # Generate any languages that are not cached yet together, before they are needed
+        self.prediction_service.fill_predictions(prediction_type, today)
+
+        for batch in self._iter_subscriber_batches(cursor or 0, batch_size):
+            calls = []
+            languages = self.language_service.get_user_languages(
+                [subscriber.user_id or subscriber.chat_id for subscriber in batch])
+            for subscriber in batch:
+                language_code = languages[str(subscriber.user_id or subscriber.chat_id)]
+                if language_code not in texts:
+                    texts[language_code] = self.prediction_service.get_daily_prediction(prediction_type, language_code)
+
+                data = {"chat_id": subscriber.chat_id, "text": texts[language_code], "parse_mode": "HTML"}
+                if reply_markup:
+                    data["reply_markup"] = json.dumps(reply_markup)
+                calls.append(("sendMessage", data))
+                queued_by_language[language_code] = queued_by_language.get(language_code, 0) + 1
+
+            self.outbound.enqueue_many(calls, OutboundScheduler.BROADCAST, checkpoint=(run_id, batch[-1].id))
+            logger.info(f"Broadcast {run_id}: queued {len(calls)} messages up to subscriber {batch[-1].id}")
+
+        summary = {
+            'run_id': run_id,
+            'queued': sum(queued_by_language.values()),
+            'previously_queued': already_queued,
+            'by_language': queued_by_language,
+            'elapsed_s': round(time.monotonic() - started, 2)
+        }
+        logger.info(f"Broadcast {run_id} finished: {summary}")
+        return summary
@@ -0,0 +1,198 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from models import PGSoftGame
+from single_flight import SingleFlight, default_lock_dir
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogRefresher:
+    """
+    Refreshes scraped game data in the background, ahead of its 30 day expiry.
+
+    User requests always get the stored copy of a game; when it is older than
+    refresh_age they call request_refresh, and a background thread refreshes it
+    (stale-while-revalidate). A periodic run (scheduler or CLI) refreshes all
+    games due for a refresh in bounded batches, oldest first.
+    """
+
+    def __init__(self, scraper, refresh_age_days=25, batch_size=50, max_batches=10, on_refresh=None):
+        """
+        Initialize the refresher.
+
+        Args:
+            scraper (PGSoftScraper): Scraper used to fetch the games
+            refresh_age_days (float): Age after which a game is refreshed
+            batch_size (int): Games fetched per batch
+            max_batches (int): Batches per periodic run (None for no limit)
+            on_refresh (callable): Called without arguments after games were refreshed
+        """
+        self.scraper = scraper
+        self.refresh_age = timedelta(days=refresh_age_days)
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.on_refresh = on_refresh
+        self.single_flight = SingleFlight(lock_dir=default_lock_dir())
+
+        self._requested = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._interval = None
+
+    def is_stale(self, last_updated):
+        """
+        Check whether a stored game should be refreshed.
+
+        Args:
+            last_updated (datetime): When the game's data was last fetched or verified
+
+        Returns:
+            bool: True if the game is older than the refresh age
+        """
+        return not last_updated or datetime.utcnow() - last_updated > self.refresh_age
+
+    def request_refresh(self, game_id):
+        """
+        Queue a game for a background refresh (requests for queued games are ignored).
+
+        Args:
+            game_id (str): The game ID
+        """
+        with self._lock:
+            if game_id in self._requested:
+                return
+            self._requested.add(game_id)
+            self._ensure_thread()
+        self._wakeup.set()
+        logger.info(f"Queued background refresh for game {game_id}")
+
+    def _refresh(self, game_ids):
+        """Fetch a batch of games, returning the per-game results."""
+        results = self.scraper.fetch_many(game_ids, force=True)
+        if self.on_refresh:
+            self.on_refresh()
+        return results
+
+    def refresh_due(self, max_batches=None, refresh_age_days=None):
+        """
+        Refresh the games due for a refresh, oldest first, in batches.
+
+        Runs at most once at a time across the workers on this host. Games that
+        fail to refresh are not retried within the same run.
+
+        Args:
+            max_batches (int): Batches to run (defaults to the refresher's max_batches)
+            refresh_age_days (float): Refresh games older than this (defaults to the refresher's setting,
+                                      0 refreshes everything)
+
+        Returns:
+            dict: Summary with the numbers of refreshed, unchanged and failed games and the elapsed time
+        """
+        max_batches = max_batches if max_batches is not None else self.max_batches
+        refresh_age = self.refresh_age if refresh_age_days is None else timedelta(days=refresh_age_days)
+
+        def run():
+            started = time.monotonic()
+            summary = {'batches': 0, 'refreshed': 0, 'unchanged': 0, 'failed': 0}
+            attempted = []
+            while max_batches is None or summary['batches'] < max_batches:
+                due_before = datetime.utcnow() - refresh_age
+                query = PGSoftGame.query.filter(PGSoftGame.last_updated < due_before)
+                if attempted:
+                    query = query.filter(PGSoftGame.game_id.notin_(attempted))
+                game_ids = [row.game_id for row in query.order_by(PGSoftGame.last_updated).limit(self.batch_size)]
+                if not game_ids:
+                    break
+
+                attempted.extend(game_ids)
+                for result in self._refresh(game_ids):
+                    if not result['ok']:
+                        summary['failed'] += 1
+                    elif result['changed']:
+                        summary['refreshed'] += 1
+                    else:
+                        summary['unchanged'] += 1
+                summary['batches'] += 1
+
+            summary['elapsed_s'] = round(time.monotonic() - started, 2)
+            logger.info(f"Catalog refresh finished: {summary}")
+            return summary
+
+        return self.single_flight.do('catalog-refresh', run)
+
+    def _ensure_thread(self):
+        """Start the background thread if it isn't running (call with the lock held)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="catalog-refresher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """Background loop: refresh requested games, and due games every interval seconds."""
+        from app import app
+
+        next_run = None
+        while True:
+            if self._interval and next_run is None:
+                next_run = time.monotonic() + self._interval
+            timeout = max(0.0, next_run - time.monotonic()) if next_run else None
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+            with self._lock:
+                requested = list(self._requested)
+            if requested:
+                try:
+                    with app.app_context():
+                        for i in range(0, len(requested), self.batch_size):
+                            self._refresh(requested[i:i + self.batch_size])
+                except Exception as e:
+                    logger.error(f"Error refreshing requested games: {e}")
+                finally:
+                    with self._lock:
+                        self._requested.difference_update(requested)
+
+            if next_run and time.monotonic() >= next_run:
+                try:
+                    with app.app_context():
+                        self.refresh_due()
+                except Exception as e:
+                    logger.error(f"Error refreshing the game catalog: {e}")
+                next_run = None
+
+    def start_scheduler(self, interval=3600):
+        """
+        Also refresh all due games periodically from the background thread.
+
+        Args:
+            interval (float): Seconds between periodic refresh runs
+        """
+        with self._lock:
+            self._interval = interval
+            self._ensure_thread()
+        self._wakeup.set()
+        logger.info(f"Catalog refresh scheduled every {interval}s")
+
+
+def create_catalog_refresher(scraper, on_refresh=None):
+    """
+    Create a refresher configured by the CATALOG_REFRESH_* environment variables.
+
+    Args:
+        scraper (PGSoftScraper): Scraper used to fetch the games
+        on_refresh (callable): Called after games were refreshed
+
+    Returns:
+        CatalogRefresher: The refresher
+    """
+    return CatalogRefresher(
+        scraper,
+        refresh_age_days=float(os.environ.get("CATALOG_REFRESH_AGE_DAYS", 25)),
+        batch_size=int(os.environ.get("CATALOG_REFRESH_BATCH", 50)),
+        max_batches=int(os.environ.get("CATALOG_REFRESH_MAX_BATCHES", 10)),
+        on_refresh=on_refresh
+    )
@@ -0,0 +1,146 @@
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from flask import g, has_app_context
+from models import PGSoftGame
+
+logger = logging.getLogger(__name__)
+
+
+class GameCatalog:
+    """
+    In-process snapshot of the cached PGSoftGame rows for a fixed list of games.
+
+    All rows are loaded with a single IN query and kept for ttl seconds. Each
+    snapshot carries a version stamp derived from the rows' last_updated times,
+    and anything rendered from it (like the formatted /ds_slot list) is memoized
+    per version, so steady-state lookups never touch the database.
+    """
+
+    def __init__(self, game_ids, ttl=300):
+        """
+        Initialize the catalog.
+
+        Args:
+            game_ids (list): Game IDs in display order
+            ttl (float): Seconds a snapshot is used before the rows are reloaded
+        """
+        self.game_ids = list(game_ids)
+        self.ttl = ttl
+        self._snapshot = None
+        self._rendered = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Load all catalog rows with one query and build a new snapshot."""
+        started = time.monotonic()
+        rows = PGSoftGame.query.filter(PGSoftGame.game_id.in_(self.game_ids)).all()
+        by_id = {row.game_id: row.to_dict() for row in rows}
+        games = [by_id[game_id] for game_id in self.game_ids if game_id in by_id]
+
+        stamp = '|'.join(f"{game['game_id']}@{game['last_updated']}" for game in games)
+        version = hashlib.sha1(stamp.encode('utf-8')).hexdigest()[:12]
+        logger.debug(f"Loaded game catalog {version} with {len(games)} games in "
+                     f"{(time.monotonic() - started) * 1000:.1f}ms")
+        return {'version': version, 'loaded_at': started, 'games': games}
+
+    def _current(self):
+        """Get the current snapshot, reloading it when it expired."""
+        snapshot = self._snapshot
+        if snapshot and time.monotonic() - snapshot['loaded_at'] < self.ttl:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot and time.monotonic() - snapshot['loaded_at'] < self.ttl:
+                return snapshot
+            new_snapshot = self._load()
+            if not snapshot or new_snapshot['version'] != snapshot['version']:
+                self._rendered = {}
+            self._snapshot = new_snapshot
+            return new_snapshot
+
+    @property
+    def version(self):
+        """The version stamp of the current snapshot."""
+        return self._current()['version']
+
+    def get_games(self):
+        """
+        Get the cached games in display order (games without a database row are skipped).
+
+        Returns:
+            list: Game dictionaries as returned by PGSoftGame.to_dict()
+        """
+        return self._current()['games']
+
+    def get_rendered(self, key, render):
+        """
+        Get a value rendered from the current snapshot, rendering it only once per version.
+
+        Args:
+            key: Identifies the rendered value (e.g. the language code)
+            render (callable): Function taking the list of games and returning the value
+
+        Returns:
+            The rendered value
+        """
+        snapshot = self._current()
+        cache_key = (snapshot['version'], key)
+        value = self._rendered.get(cache_key)
+        if value is None:
+            value = render(snapshot['games'])
+            self._rendered[cache_key] = value
+        return value
+
+    def invalidate(self):
+        """Force the next lookup to reload the rows (call after updating a game in this process)."""
+        self._snapshot = None
+
+
+def lookup_game(game_id):
+    """
+    Get a stored game together with its freshness, using one query.
+
+    Results are memoized for the current request (application context), so
+    repeated lookups of the same game while handling one update are free.
+
+    Args:
+        game_id (str): The game ID
+
+    Returns:
+        dict: {'game': game dict or None, 'last_updated': datetime or None,
+               'fresh': True if the data is younger than PGSoftGame.CACHE_TTL}
+    """
+    memo = None
+    if has_app_context():
+        memo = g.setdefault('game_lookups', {})
+        if game_id in memo:
+            return memo[game_id]
+
+    game = PGSoftGame.query.filter_by(game_id=game_id).first()
+    last_updated = game.last_updated if game else None
+    lookup = {
+        'game': game.to_dict() if game else None,
+        'last_updated': last_updated,
+        'fresh': bool(last_updated) and datetime.utcnow() - last_updated < PGSoftGame.CACHE_TTL
+    }
+    if memo is not None:
+        memo[game_id] = lookup
+    return lookup
+
+
+def forget_game_lookups(game_ids):
+    """
+    Drop memoized lookups of games that were just written.
+
+    Args:
+        game_ids (list): The game IDs
+    """
+    if has_app_context():
+        memo = g.get('game_lookups')
+        if memo:
+            for game_id in game_ids:
+                memo.pop(game_id, None)
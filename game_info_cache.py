@@ -0,0 +1,193 @@
+import os
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models import GameInfoCache
+
+logger = logging.getLogger(__name__)
+
+
+class GameInfoTextCache:
+    """
+    Persistent cache for the generated /slotgame texts, stored in the game_info_cache table.
+
+    Entries are keyed by game ID and language and remember a hash of the game
+    fields they were generated from, so a text is only reused while the scraped
+    data it describes is unchanged. Entries expire after ttl_days and the least
+    recently used ones are evicted once the table grows past max_entries.
+    """
+
+    # Only write last_accessed back when it is older than this, so hits stay read-only
+    TOUCH_INTERVAL = timedelta(hours=1)
+
+    def __init__(self, ttl_days=30, max_entries=5000):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl_days (float): How long a generated text may be reused
+            max_entries (int): Maximum number of cached texts before LRU eviction
+        """
+        self.ttl = timedelta(days=ttl_days)
+        self.max_entries = max_entries
+
+    @staticmethod
+    def source_hash(game_data):
+        """
+        Hash the game fields that go into the prompt.
+
+        Args:
+            game_data (dict): The game data (name, description, rtp, detail_url)
+
+        Returns:
+            str: Hex digest identifying the source data
+        """
+        source = '\x1f'.join(str(game_data.get(field) or '') for field in ('name', 'description', 'rtp', 'detail_url'))
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+    def get(self, game_id, language_code, source_hash):
+        """
+        Get a cached game info text.
+
+        Args:
+            game_id (str): The PGSoft game ID
+            language_code (str): The language code
+            source_hash (str): Hash of the current game data
+
+        Returns:
+            dict: {"text": ..., "image_url": ...}, or None on a miss
+        """
+        entry = GameInfoCache.query.filter_by(game_id=game_id, language_code=language_code).first()
+        if not entry or entry.source_hash != source_hash:
+            return None
+
+        now = datetime.utcnow()
+        if now - entry.created_at > self.ttl:
+            return None
+
+        if now - entry.last_accessed > self.TOUCH_INTERVAL:
+            try:
+                entry.last_accessed = now
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f"Failed to update game info cache access time: {e}")
+
+        return {"text": entry.text, "image_url": entry.image_url}
+
+    def get_latest(self, game_id, language_code):
+        """
+        Get the last generated text of a game, even if it is stale (a fallback when generation fails).
+
+        Args:
+            game_id (str): The PGSoft game ID
+            language_code (str): The language code
+
+        Returns:
+            dict: {"text": ..., "image_url": ...}, or None if the game was never generated
+        """
+        try:
+            entry = GameInfoCache.query.filter_by(game_id=game_id, language_code=language_code).first()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Failed to read the last game info text of {game_id}: {e}")
+            return None
+        if not entry:
+            return None
+        return {"text": entry.text, "image_url": entry.image_url}
+
+    def set(self, game_id, language_code, source_hash, text, image_url):
+        """
+        Store a generated game info text, replacing any older entry for the game and language.
+
+        Args:
+            game_id (str): The PGSoft game ID
+            language_code (str): The language code
+            source_hash (str): Hash of the game data the text was generated from
+            text (str): The formatted game info text
+            image_url (str): The image URL sent with the text
+        """
+        now = datetime.utcnow()
+        values = {
+            'source_hash': source_hash,
+            'text': text,
+            'image_url': image_url,
+            'created_at': now,
+            'last_accessed': now
+        }
+        try:
+            entry = GameInfoCache.query.filter_by(game_id=game_id, language_code=language_code).first()
+            if entry:
+                for key, value in values.items():
+                    setattr(entry, key, value)
+            else:
+                db.session.add(GameInfoCache(game_id=game_id, language_code=language_code, **values))
+            db.session.commit()
+        except IntegrityError:
+            # Another worker cached the same game first, overwrite it
+            db.session.rollback()
+            GameInfoCache.query.filter_by(game_id=game_id, language_code=language_code).update(values)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to cache game info for {game_id}: {e}")
+            return
+
+        self._evict()
+
+    def invalidate(self, game_id):
+        """
+        Drop all cached texts of a game (called when the scraper changes its data).
+
+        Note: the caller commits the session.
+
+        Args:
+            game_id (str): The PGSoft game ID
+        """
+        self.invalidate_many([game_id])
+
+    def invalidate_many(self, game_ids):
+        """
+        Drop all cached texts of several games.
+
+        Note: the caller commits the session.
+
+        Args:
+            game_ids (list): The PGSoft game IDs
+        """
+        deleted = GameInfoCache.query.filter(GameInfoCache.game_id.in_(game_ids)).delete(synchronize_session=False)
+        if deleted:
+            logger.info(f"Invalidated {deleted} cached game info texts for {', '.join(game_ids)}")
+
+    def _evict(self):
+        """Delete expired entries and the least recently used ones beyond max_entries."""
+        try:
+            GameInfoCache.query.filter(GameInfoCache.created_at < datetime.utcnow() - self.ttl).delete()
+            overflow = GameInfoCache.query.count() - self.max_entries
+            if overflow > 0:
+                oldest = (db.session.query(GameInfoCache.id)
+                          .order_by(GameInfoCache.last_accessed)
+                          .limit(overflow)
+                          .all())
+                GameInfoCache.query.filter(
+                    GameInfoCache.id.in_([row.id for row in oldest])).delete(synchronize_session=False)
+                logger.info(f"Evicted {overflow} least recently used game info texts")
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Failed to evict game info cache entries: {e}")
+
+
+def create_game_info_cache():
+    """
+    Create the game info cache configured by the GAME_INFO_CACHE_* environment variables.
+
+    Returns:
+        GameInfoTextCache: The configured cache
+    """
+    return GameInfoTextCache(
+        ttl_days=float(os.environ.get("GAME_INFO_CACHE_TTL_DAYS", 30)),
+        max_entries=int(os.environ.get("GAME_INFO_CACHE_MAX_ENTRIES", 5000))
+    )
@@ -0,0 +1,315 @@
+import re
+import time
+import logging
+import threading
+import unicodedata
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Extra names users type for games, mapped to game IDs
+GAME_ALIASES = {
+    "mahjong 2": "pg-soft-mahjong-ways-2",
+    "mahjong ways ii": "pg-soft-mahjong-ways-2",
+    "mw2": "pg-soft-mahjong-ways-2",
+    "mw": "pg-soft-mahjong-ways",
+    "mahjong": "pg-soft-mahjong-ways",
+    "aztec": "pg-soft-treasures-of-aztec",
+    "treasure of aztec": "pg-soft-treasures-of-aztec",
+    "neko": "pg-soft-lucky-neko",
+    "ganesha": "pg-soft-ganesha-fortune",
+    "bandito": "pg-soft-wild-bandito",
+    "icescape": "pg-soft-the-great-icescape",
+    "great icescape": "pg-soft-the-great-icescape",
+    "medusa ii": "pg-soft-medusa-2",
+    "macau": "pg-soft-dreams-of-macau",
+}
+
+
+# Roman numerals in sequel titles ("Medusa II"), written as numbers so they are compared like digits
+ROMAN_NUMERALS = {'ii': '2', 'iii': '3', 'iv': '4', 'vi': '6', 'vii': '7', 'viii': '8', 'ix': '9'}
+
+
+def normalize_name(name):
+    """
+    Normalize a game name for matching: lowercase, without accents, punctuation or a PG Soft prefix.
+
+    Roman numerals of sequels become numbers ("medusa ii" -> "medusa 2").
+
+    Args:
+        name (str): The game name as typed or stored
+
+    Returns:
+        str: Space-separated normalized tokens
+    """
+    name = unicodedata.normalize('NFKD', name.lower())
+    name = ''.join(char for char in name if not unicodedata.combining(char))
+    tokens = re.findall(r'[a-z0-9]+', name)
+    if tokens[:2] == ['pg', 'soft']:
+        tokens = tokens[2:]
+    elif tokens[:1] == ['pgsoft']:
+        tokens = tokens[1:]
+    return ' '.join(ROMAN_NUMERALS.get(token, token) for token in tokens)
+
+
+def _digits(key):
+    """Get the numbers in a normalized name ("mahjong ways 2" -> ('2',)), which a fuzzy match must keep."""
+    return tuple(re.findall(r'[0-9]+', key))
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a, b, limit):
+    """Levenshtein distance between a and b, or limit + 1 once it is certain to exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        char_a = a[i - 1]
+        # Cells further than limit from the diagonal can't lead to a distance within limit
+        low, high = max(1, i - limit), min(len(b), i + limit)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= limit else over
+        row_min = current[0]
+        for j in range(low, high + 1):
+            cost = previous[j - 1] if char_a == b[j - 1] else previous[j - 1] + 1
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > limit:
+            return over
+        previous = current
+    return min(previous[-1], over)
+
+
+class GameNameIndex:
+    """
+    In-memory index resolving typed game names to game IDs.
+
+    Names are normalized into token strings; an exact (or alias) match is a
+    dictionary lookup, anything else is matched by trigram overlap and then
+    edit distance, so typos resolve without a scrape. A fuzzy match never
+    changes the numbers in a name, so an unknown sequel is scraped rather than
+    served as its neighbour. Entries are added or
+    renamed one game at a time, and new rows in the pgsoft_games table are
+    pulled in incrementally by last_updated.
+    """
+
+    # Bound on the memo of resolved queries, which are user input
+    MAX_RESOLVED = 10000
+    # Trigram prefilter before computing edit distances
+    MIN_TRIGRAM_DICE = 0.4
+    MAX_CANDIDATES = 5
+
+    def __init__(self, min_similarity=0.75, db_sync_interval=300):
+        """
+        Initialize the index.
+
+        Args:
+            min_similarity (float): Lowest edit similarity (0-1) accepted for a fuzzy match
+            db_sync_interval (float): Seconds between incremental syncs with the pgsoft_games table
+        """
+        self.min_similarity = min_similarity
+        self.db_sync_interval = db_sync_interval
+        self._keys = {}          # normalized name -> game ID
+        self._names = {}         # game ID -> normalized names of the game
+        self._pinned = {}        # game ID -> names added by the mapping or aliases, kept on renames
+        self._trigrams = {}      # trigram -> normalized names containing it
+        self._trigram_counts = {}  # normalized name -> number of its trigrams
+        self._resolved = {}      # memo of resolved queries, cleared on every change
+        self._lock = threading.Lock()
+        self._synced_until = None
+        self._next_sync = 0.0
+
+    def _add_key(self, key, game_id):
+        if not key:
+            return
+        self._keys[key] = game_id
+        self._names.setdefault(game_id, set()).add(key)
+        trigrams = _trigrams(key)
+        self._trigram_counts[key] = len(trigrams)
+        for trigram in trigrams:
+            self._trigrams.setdefault(trigram, set()).add(key)
+
+    def _remove_key(self, key, game_id):
+        if self._keys.get(key) != game_id:
+            # The name now belongs to another game
+            return
+        del self._keys[key]
+        self._trigram_counts.pop(key, None)
+        for trigram in _trigrams(key):
+            keys = self._trigrams.get(trigram)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._trigrams[trigram]
+
+    def add_game(self, game_id, name, aliases=(), pinned=False):
+        """
+        Add a game or replace its name.
+
+        Args:
+            game_id (str): The game ID
+            name (str): The display name
+            aliases (iterable): Other names of the game
+            pinned (bool): Keep these names when the game is renamed later (e.g. by a database sync)
+        """
+        with self._lock:
+            kept = self._pinned.get(game_id, set())
+            for key in self._names.pop(game_id, set()) - kept:
+                self._remove_key(key, game_id)
+            self._names[game_id] = set(kept)
+            for alias_name in (name, *aliases):
+                key = normalize_name(alias_name)
+                # Also match names typed without spaces ("mahjongways2")
+                for variant in (key, key.replace(' ', '')):
+                    self._add_key(variant, game_id)
+                    if pinned and variant:
+                        self._pinned.setdefault(game_id, set()).add(variant)
+            self._resolved.clear()
+
+    def add_alias(self, alias, game_id):
+        """
+        Add another name for a game.
+
+        Args:
+            alias (str): The alternative name
+            game_id (str): The game ID
+        """
+        with self._lock:
+            key = normalize_name(alias)
+            self._add_key(key, game_id)
+            if key:
+                self._pinned.setdefault(game_id, set()).add(key)
+            self._resolved.clear()
+
+    def resolve(self, query):
+        """
+        Resolve a typed game name.
+
+        Args:
+            query (str): The name the user typed
+
+        Returns:
+            str: The matching game ID, or None if no game is close enough
+        """
+        self._maybe_sync()
+        key = normalize_name(query)
+        if not key:
+            return None
+
+        resolved = self._resolved.get(key, False)
+        if resolved is not False:
+            return resolved
+
+        with self._lock:
+            game_id = self._keys.get(key) or self._keys.get(key.replace(' ', ''))
+            if not game_id:
+                game_id = self._fuzzy_match(key)
+                logger.debug(f"Fuzzy matched game name '{query}' to {game_id}")
+            if len(self._resolved) >= self.MAX_RESOLVED:
+                self._resolved.clear()
+            self._resolved[key] = game_id
+        return game_id
+
+    def _fuzzy_match(self, key):
+        """Find the closest indexed name by trigram overlap and edit distance (call with the lock held)."""
+        digits = _digits(key)
+        query_trigrams = _trigrams(key)
+        overlap = {}
+        for trigram in query_trigrams:
+            for candidate in self._trigrams.get(trigram, ()):
+                overlap[candidate] = overlap.get(candidate, 0) + 1
+
+        # Only the few candidates sharing most of their trigrams are worth an edit distance
+        scored = []
+        for candidate, shared in overlap.items():
+            # "mahjong ways 3" is not a typo of "mahjong ways 2"
+            if _digits(candidate) != digits:
+                continue
+            dice = 2 * shared / (len(query_trigrams) + self._trigram_counts[candidate])
+            if dice >= self.MIN_TRIGRAM_DICE:
+                scored.append((dice, candidate))
+        scored.sort(reverse=True)
+
+        best_game_id, best_similarity = None, 0.0
+        for _, candidate in scored[:self.MAX_CANDIDATES]:
+            longest = max(len(key), len(candidate))
+            limit = int(longest * (1 - self.min_similarity))
+            distance = _edit_distance(key, candidate, limit)
+            if distance > limit:
+                continue
+            similarity = 1 - distance / longest
+            if similarity > best_similarity:
+                best_game_id, best_similarity = self._keys[candidate], similarity
+        return best_game_id
+
+    def invalidate(self):
+        """Sync with the database on the next resolve (call after games were written)."""
+        self._next_sync = 0.0
+
+    def _maybe_sync(self):
+        """Pull games added or renamed in the database since the last sync, at most every db_sync_interval."""
+        now = time.monotonic()
+        if now < self._next_sync:
+            return
+        self._next_sync = now + self.db_sync_interval
+        try:
+            self.sync_from_database()
+        except Exception as e:
+            logger.warning(f"Failed to sync the game name index: {e}")
+
+    def sync_from_database(self):
+        """
+        Add the scraped games stored (or updated) since the last sync.
+
+        Rows without a description are skipped: they are fallbacks written for
+        pages that could not be scraped, often from a mistyped name, and would
+        otherwise make the typo resolve to itself.
+
+        Returns:
+            int: The number of games added or updated
+        """
+        from models import PGSoftGame
+
+        started = datetime.utcnow()
+        query = PGSoftGame.query.with_entities(PGSoftGame.game_id, PGSoftGame.name).filter(
+            PGSoftGame.description != '', PGSoftGame.description.isnot(None))
+        if self._synced_until:
+            query = query.filter(PGSoftGame.last_updated >= self._synced_until)
+        rows = query.all()
+
+        for game_id, name in rows:
+            self.add_game(game_id, name, aliases=self._aliases_of(game_id))
+        self._synced_until = started
+        if rows:
+            logger.info(f"Game name index synced {len(rows)} games")
+        return len(rows)
+
+    def _aliases_of(self, game_id):
+        return [alias for alias, alias_game_id in GAME_ALIASES.items() if alias_game_id == game_id]
+
+
+def build_game_name_index(game_id_mapping, **kwargs):
+    """
+    Build the index from the known popular games and the built-in aliases.
+
+    Args:
+        game_id_mapping (dict): {lowercase game name: game ID}
+        **kwargs: Passed to GameNameIndex
+
+    Returns:
+        GameNameIndex: The index (stored games are added on the first resolve)
+    """
+    index = GameNameIndex(**kwargs)
+    for name, game_id in game_id_mapping.items():
+        index.add_game(game_id, name, aliases=index._aliases_of(game_id), pinned=True)
+    return index
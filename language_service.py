@@ -2,6 +2,7 @@ import os
 import json
 import logging
 from datetime import datetime
+from user_preference_store import create_user_preference_store
 
 logger = logging.getLogger(__name__)
 
@@ -19,12 +20,8 @@ class LanguageService:
     
     def __init__(self):
         """Initialize the language service."""
-        # Dictionary to store user language preferences: {user_id: language_code}
-        self.user_languages = {}
-        
-        # Load language data from file if it exists
-        self.data_file = 'user_languages.json'
-        self._load_user_languages()
+        # Per-user language preferences: {user_id: language_code}, see USER_PREFERENCE_STORE
+        self.preference_store = create_user_preference_store()
         
         # Load translations
         self.translations = {
@@ -36,27 +33,6 @@ class LanguageService:
         
         logger.info(f"Language service initialized with {len(self.translations)} languages")
     
-    def _load_user_languages(self):
-        """Load user language preferences from file."""
-        try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    self.user_languages = json.load(f)
-                logger.info(f"Loaded language preferences for {len(self.user_languages)} users")
-            else:
-                logger.info("No existing language preferences file found")
-        except Exception as e:
-            logger.error(f"Error loading user languages: {e}")
-    
-    def _save_user_languages(self):
-        """Save user language preferences to file."""
-        try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.user_languages, f)
-            logger.info(f"Saved language preferences for {len(self.user_languages)} users")
-        except Exception as e:
-            logger.error(f"Error saving user languages: {e}")
-    
     def _load_translations(self, language_code):
         """Load translations for a specific language."""
         try:
@@ -82,9 +58,23 @@ class LanguageService:
         Returns:
             str: The language code (vi, en, th, zh)
         """
-        # Convert user_id to string for JSON serialization
+        # Preferences are keyed by the user ID as a string
         user_id = str(user_id)
-        return self.user_languages.get(user_id, self.DEFAULT_LANGUAGE)
+        return self.preference_store.get(user_id) or self.DEFAULT_LANGUAGE
+    
+    def get_user_languages(self, user_ids):
+        """
+        Get the preferred languages of many users with a single lookup.
+        
+        Args:
+            user_ids (list): Telegram user IDs
+            
+        Returns:
+            dict: {str(user_id): language_code} for every requested user
+        """
+        user_ids = [str(user_id) for user_id in user_ids]
+        preferences = self.preference_store.get_many(user_ids)
+        return {user_id: preferences.get(user_id, self.DEFAULT_LANGUAGE) for user_id in user_ids}
     
     def set_user_language(self, user_id, language_code):
         """
@@ -101,10 +91,13 @@ class LanguageService:
             logger.warning(f"Invalid language code: {language_code}")
             return False
         
-        # Convert user_id to string for JSON serialization
+        # Preferences are keyed by the user ID as a string
         user_id = str(user_id)
-        self.user_languages[user_id] = language_code
-        self._save_user_languages()
+        try:
+            self.preference_store.set(user_id, language_code)
+        except Exception as e:
+            logger.error(f"Error saving language for user {user_id}: {e}")
+            return False
         return True
     
     def get_text(self, key, language_code=None):
@@ -0,0 +1,273 @@
+import os
+import time
+import random
+import logging
+import threading
+import openai
+from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+
+class LLMError(Exception):
+    """A completion could not be produced (after retries, or because the circuit is open)."""
+
+
+class CircuitOpenError(LLMError):
+    """Calls are short-circuited because the LLM API failed repeatedly."""
+
+
+# Failures worth another attempt; other API errors (bad request, auth, ...) won't succeed on retry
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError
+)
+
+
+class LLMGateway:
+    """
+    Shared entry point for chat completions, with deadlines, retries and a circuit breaker.
+
+    Every attempt gets a timeout and the whole call (including retries) a
+    deadline, so a slow API can't pin a worker. Timeouts, connection errors,
+    429s and 5xx are retried with exponentially growing, fully jittered
+    delays. After failure_threshold consecutive failed calls the circuit
+    opens: calls fail immediately for reset_timeout seconds, then a single
+    trial call decides whether it closes again. Callers catch LLMError and
+    fall back to cached or locally generated content.
+    """
+
+    def __init__(self, client, timeout=30.0, deadline=60.0, max_retries=2, backoff=0.5, max_backoff=4.0,
+                 failure_threshold=3, reset_timeout=60.0):
+        """
+        Initialize the gateway.
+
+        Args:
+            client (OpenAI): The OpenAI client (its own retries should be disabled)
+            timeout (float): Default timeout in seconds of one attempt (between chunks when streaming)
+            deadline (float): Default time budget in seconds of a call, including retries
+            max_retries (int): Retries after a failed attempt
+            backoff (float): Base delay in seconds before the first retry
+            max_backoff (float): Upper bound of the retry delay
+            failure_threshold (int): Consecutive failed calls that open the circuit
+            reset_timeout (float): Seconds the circuit stays open before a trial call
+        """
+        self.client = client
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._stats = {
+            'calls': 0,
+            'failures': 0,
+            'retries': 0,
+            'short_circuited': 0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0
+        }
+
+    def complete(self, messages, model="gpt-4o-mini", max_tokens=1000, on_text=None, timeout=None, deadline=None,
+                 **options):
+        """
+        Get a chat completion.
+
+        Args:
+            messages (list): The chat messages
+            model (str): The model
+            max_tokens (int): Maximum number of generated tokens
+            on_text (callable): Streams the completion, called with the text generated so far;
+                                a stream is only retried before its first text arrived. Errors
+                                raised by on_text are logged and stop the updates, not the call
+            timeout (float): Timeout of one attempt (defaults to the gateway's)
+            deadline (float): Time budget of the call (defaults to the gateway's)
+            **options: Further chat.completions.create parameters (e.g. response_format)
+
+        Returns:
+            str: The generated text
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+            LLMError: If no completion could be produced
+        """
+        trial = self._before_call()
+        try:
+            text = self._complete_with_retries(messages, model, max_tokens, on_text, timeout or self.timeout,
+                                               time.monotonic() + (deadline or self.deadline), options)
+            if not text:
+                # The API answered, so this is not an outage
+                self._on_failure(trip=False)
+                raise LLMError("empty completion")
+            self._on_success()
+            return text
+        finally:
+            if trial:
+                with self._lock:
+                    # Also when no outcome was recorded (e.g. KeyboardInterrupt), so a new trial can run
+                    self._trial_running = False
+
+    def _complete_with_retries(self, messages, model, max_tokens, on_text, timeout, deadline_at, options):
+        """Make attempts until one returns or no retry is left, recording failures."""
+        attempt = 0
+        streamed = []
+
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                self._on_failure()
+                raise LLMError("deadline exceeded")
+            try:
+                request = dict(model=model, messages=messages, max_tokens=max_tokens,
+                               timeout=min(timeout, remaining), **options)
+                if on_text:
+                    return self._stream(request, on_text, deadline_at, streamed)
+                response = self.client.chat.completions.create(**request)
+                self._count_usage(getattr(response, 'usage', None))
+                return response.choices[0].message.content
+            except Exception as e:
+                # Bad requests, auth errors etc. are our fault rather than an outage: not retried and
+                # they don't trip the circuit
+                outage = isinstance(e, (LLMError,) + RETRYABLE_ERRORS)
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                if outage and not streamed and attempt < self.max_retries \
+                        and time.monotonic() + delay < deadline_at:
+                    attempt += 1
+                    with self._lock:
+                        self._stats['retries'] += 1
+                    logger.warning(f"LLM call failed ({type(e).__name__}: {e}), retry {attempt} in {delay:.2f}s")
+                    time.sleep(delay)
+                    continue
+
+                self._on_failure(trip=outage)
+                if isinstance(e, LLMError):
+                    raise
+                raise LLMError(f"{type(e).__name__}: {e}") from e
+
+    def _stream(self, request, on_text, deadline_at, streamed):
+        """Consume a streamed completion, collecting the text in streamed."""
+        stream = self.client.chat.completions.create(stream=True, **request)
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    streamed.append(chunk.choices[0].delta.content)
+                    if on_text:
+                        try:
+                            on_text(''.join(streamed))
+                        except Exception as e:
+                            # The caller's display failed (e.g. a Telegram edit), the completion is fine
+                            logger.warning(f"Streaming callback failed, no more updates for this call: {e}")
+                            on_text = None
+                if time.monotonic() > deadline_at:
+                    raise LLMError("deadline exceeded while streaming")
+        finally:
+            close = getattr(stream, 'close', None)
+            if close:
+                close()
+        return ''.join(streamed)
+
+    def _count_usage(self, usage):
+        if usage:
+            with self._lock:
+                self._stats['prompt_tokens'] += getattr(usage, 'prompt_tokens', 0) or 0
+                self._stats['completion_tokens'] += getattr(usage, 'completion_tokens', 0) or 0
+
+    @property
+    def state(self):
+        """The circuit state: closed, open or half_open."""
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return 'open'
+        return 'half_open'
+
+    def _before_call(self):
+        """
+        Let the call through, or raise CircuitOpenError (only one trial call when half open).
+
+        Returns:
+            bool: True if the call is the half open circuit's trial
+        """
+        with self._lock:
+            self._stats['calls'] += 1
+            state = self.state
+            if state == 'closed':
+                return False
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                logger.info("LLM circuit half open, letting a trial call through")
+                return True
+            self._stats['short_circuited'] += 1
+        raise CircuitOpenError("LLM circuit is open")
+
+    def _on_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("LLM circuit closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def _on_failure(self, trip=True):
+        with self._lock:
+            self._stats['failures'] += 1
+            if not trip:
+                # Not an outage, but the API answered: a half open circuit may close
+                if self._trial_running:
+                    self._trial_running = False
+                    self._failures = 0
+                    self._opened_at = None
+                    logger.info("LLM circuit closed")
+                return
+            if self._trial_running:
+                # The trial failed, stay open for another reset_timeout
+                self._trial_running = False
+                self._opened_at = time.monotonic()
+                logger.warning("LLM trial call failed, circuit stays open")
+                return
+            self._failures += 1
+            if self._failures >= self.failure_threshold and self._opened_at is None:
+                self._opened_at = time.monotonic()
+                logger.error(f"LLM circuit opened after {self._failures} consecutive failures, "
+                             f"failing fast for {self.reset_timeout}s")
+
+    def get_metrics(self):
+        """
+        Get the call counters and the circuit state.
+
+        Returns:
+            dict: Counts of calls, failures, retries, short-circuited calls and tokens, and the state
+        """
+        with self._lock:
+            return {**self._stats, 'state': self.state, 'consecutive_failures': self._failures}
+
+
+def create_llm_gateway():
+    """
+    Create the OpenAI client and gateway configured by OPENAI_API_KEY and the LLM_* environment variables.
+
+    Returns:
+        LLMGateway: The gateway
+    """
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY environment variable is not set")
+
+    # Retries are done by the gateway, within its deadline
+    client = OpenAI(api_key=api_key, max_retries=0)
+    return LLMGateway(
+        client,
+        timeout=float(os.environ.get("LLM_TIMEOUT", 30)),
+        deadline=float(os.environ.get("LLM_DEADLINE", 60)),
+        max_retries=int(os.environ.get("LLM_MAX_RETRIES", 2)),
+        failure_threshold=int(os.environ.get("LLM_BREAKER_THRESHOLD", 3)),
+        reset_timeout=float(os.environ.get("LLM_BREAKER_RESET", 60))
+    )
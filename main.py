@@ -1,9 +1,17 @@
-from app import app, db  # noqa: F401
+from app import app, db
+from service_registry import mark_startup_phase
 import models  # Import models to register them with SQLAlchemy
 
 # Create database tables
 with app.app_context():
     db.create_all()
 
+    # create_all() only creates missing tables, add indexes introduced since then
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+mark_startup_phase("create_tables")
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -1,10 +1,13 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from app import db
 
 class PGSoftGame(db.Model):
     """Model for storing PGSoft game information."""
     __tablename__ = 'pgsoft_games'
     
+    # How long scraped data is considered valid
+    CACHE_TTL = timedelta(days=30)
+    
     id = db.Column(db.Integer, primary_key=True)
     game_id = db.Column(db.String(50), unique=True, nullable=False)
     name = db.Column(db.String(100), nullable=False)
@@ -12,7 +15,7 @@ class PGSoftGame(db.Model):
     image_url = db.Column(db.String(500))
     rtp = db.Column(db.String(20))
     detail_url = db.Column(db.String(500))
-    last_updated = db.Column(db.DateTime, default=datetime.utcnow)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     def __repr__(self):
         return f'<PGSoftGame {self.name}>'
@@ -37,7 +40,67 @@ class PGSoftGame(db.Model):
         if not game:
             return False
             
-        now = datetime.utcnow()
-        delta = now - game.last_updated
         # Cache is valid for one month (30 days)
-        return delta.days < 30
\ No newline at end of file
+        return datetime.utcnow() - game.last_updated < cls.CACHE_TTL
+
+class GameInfoCache(db.Model):
+    """Model for caching the generated game info text per game and language."""
+    __tablename__ = 'game_info_cache'
+    __table_args__ = (
+        db.UniqueConstraint('game_id', 'language_code', name='uq_game_info_cache_game_language'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.String(50), nullable=False)
+    language_code = db.Column(db.String(5), nullable=False)
+    # Hash of the PGSoftGame fields the text was generated from
+    source_hash = db.Column(db.String(64), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    image_url = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_accessed = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<GameInfoCache {self.game_id}/{self.language_code}>'
+
+class DailyPrediction(db.Model):
+    """Model for sharing generated daily predictions between workers and restarts."""
+    __tablename__ = 'daily_predictions'
+    __table_args__ = (
+        db.UniqueConstraint('lottery_type', 'language_code', 'prediction_date', name='uq_daily_prediction_slot'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    lottery_type = db.Column(db.String(20), nullable=False)
+    language_code = db.Column(db.String(5), nullable=False)
+    prediction_date = db.Column(db.Date, nullable=False)
+    prediction = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DailyPrediction {self.lottery_type}/{self.language_code} {self.prediction_date}>'
+
+
+class BotSubscriber(db.Model):
+    """Model for chats subscribed to the daily prediction broadcast."""
+    __tablename__ = 'bot_subscribers'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    chat_id = db.Column(db.BigInteger, unique=True, nullable=False)
+    user_id = db.Column(db.BigInteger)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<BotSubscriber {self.chat_id}>'
+
+
+class UserPreference(db.Model):
+    """Model for storing each Telegram user's preferred language."""
+    __tablename__ = 'user_preferences'
+    
+    user_id = db.Column(db.String(32), primary_key=True)
+    language_code = db.Column(db.String(5), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UserPreference {self.user_id}={self.language_code}>'
@@ -0,0 +1,206 @@
+import os
+import time
+import random
+import secrets
+import hashlib
+import logging
+import threading
+from prompt_registry import compile_template, render_template
+
+logger = logging.getLogger(__name__)
+
+# Number sets of each lottery type: {group: [(field, digits, count or (min, max) count)]}.
+# The fields are rendered through the "number_prediction_<type>" translation templates as
+# {group_field}; lists of numbers are joined with ", ".
+LOTTERY_LAYOUTS = {
+    'vietnam': {
+        'north': [('special', 6, 1), ('pairs', 2, (3, 5))],
+        'central': [('special', 6, 1), ('pairs', 2, (3, 5))],
+        'south': [('special', 6, 1), ('pairs', 2, (3, 5))]
+    },
+    '4d': {
+        'main': [('special', 4, 1), ('first', 4, 1), ('second', 4, 1), ('lucky', 4, (5, 7))]
+    },
+    'thai': {
+        'main': [('special', 6, 1), ('first', 3, 1), ('second', 2, 1), ('lucky', 2, (5, 7))]
+    },
+    'indo': {
+        'main': [('4d', 4, 1), ('3d', 3, 1), ('2d', 2, 1), ('lucky', 2, (5, 7))]
+    }
+}
+
+
+def is_patterned(number):
+    """
+    Check whether a number looks made up rather than random.
+
+    Rejects numbers made of one repeated digit (111111, 77), and in numbers of
+    three or more digits any run of three equal digits (x555xx) or three
+    digits counting up or down (123, 987).
+
+    Args:
+        number (str): The digits
+
+    Returns:
+        bool: True if the number has a pattern
+    """
+    if len(set(number)) == 1:
+        return True
+    for i in range(len(number) - 2):
+        a, b, c = (int(digit) for digit in number[i:i + 3])
+        if b - a == c - b and abs(b - a) <= 1:
+            return True
+    return False
+
+
+class NumberEngine:
+    """
+    Local, LLM-free lottery prediction generator.
+
+    Numbers are drawn from a random generator seeded with the lottery type and
+    the date, so every worker produces the same prediction for a day without
+    coordinating. Patterned numbers are redrawn and no number appears twice in
+    a prediction. The text is rendered through per-language templates from the
+    translation files, which are compiled once.
+    """
+
+    # Attempts per number before giving up on the pattern filter
+    MAX_DRAWS = 100
+
+    def __init__(self, language_service, seed=''):
+        """
+        Initialize the engine.
+
+        Args:
+            language_service (LanguageService): Source of the prediction templates
+            seed (str): Secret mixed into the per-day seed, so the numbers can't be predicted from the date
+        """
+        self.language_service = language_service
+        self.seed = seed
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def supports(self, prediction_type):
+        """Check whether the engine has a layout for a lottery type."""
+        return prediction_type in LOTTERY_LAYOUTS
+
+    def generate(self, prediction_type, prediction_date):
+        """
+        Draw the numbers of a prediction.
+
+        Args:
+            prediction_type (str): The lottery type ('vietnam', '4d', 'thai', 'indo')
+            prediction_date (date): The day to predict for
+
+        Returns:
+            dict: {"<group>_<field>": number or list of numbers}
+        """
+        digest = hashlib.sha256(f"{self.seed}:{prediction_type}:{prediction_date.isoformat()}".encode()).digest()
+        rng = random.Random(int.from_bytes(digest[:8], 'big'))
+        used = set()
+        numbers = {}
+        for group, fields in LOTTERY_LAYOUTS[prediction_type].items():
+            for field, digits, count in fields:
+                drawn = [self._draw(rng, digits, used)
+                         for _ in range(count if isinstance(count, int) else rng.randint(*count))]
+                numbers[f"{group}_{field}"] = drawn[0] if count == 1 else drawn
+        return numbers
+
+    def _draw(self, rng, digits, used):
+        """Draw one number without a pattern that wasn't drawn before."""
+        for _ in range(self.MAX_DRAWS):
+            number = str(rng.randrange(10 ** digits)).zfill(digits)
+            if number not in used and not is_patterned(number):
+                used.add(number)
+                return number
+        raise ValueError(f"Could not draw an unused {digits}-digit number")
+
+    def _template(self, prediction_type, language_code):
+        """Get the compiled template: a list of (literal text, field name or None) pieces."""
+        key = (prediction_type, language_code)
+        template = self._templates.get(key)
+        if template is None:
+            text_key = f"number_prediction_{prediction_type}"
+            text = self.language_service.get_text(text_key, language_code)
+            if text == text_key:
+                raise KeyError(f"No {text_key} template for {language_code}")
+            template = compile_template(text, self._fields(prediction_type))
+            with self._lock:
+                self._templates[key] = template
+        return template
+
+    def render(self, prediction_type, language_code, prediction_date):
+        """
+        Generate a prediction and render it in a language.
+
+        Args:
+            prediction_type (str): The lottery type
+            language_code (str): The language code
+            prediction_date (date): The day to predict for
+
+        Returns:
+            str: The formatted prediction text
+        """
+        values = {name: ', '.join(value) if isinstance(value, list) else value
+                  for name, value in self.generate(prediction_type, prediction_date).items()}
+        values['date'] = prediction_date.strftime("%d/%m/%Y")
+        return render_template(self._template(prediction_type, language_code), values)
+
+    def _fields(self, prediction_type):
+        """Get the template fields of a lottery type."""
+        fields = {'date'}
+        for group, group_fields in LOTTERY_LAYOUTS[prediction_type].items():
+            fields.update(f"{group}_{field}" for field, _, _ in group_fields)
+        return fields
+
+
+def load_install_seed(seed_file):
+    """
+    Get the seed of this install, generating and saving a random one on first use.
+
+    The file is created exclusively, so workers starting at the same time all
+    end up with the seed of whichever created it first.
+
+    Args:
+        seed_file (str): Path of the file holding the seed
+
+    Returns:
+        str: The seed
+    """
+    seed = secrets.token_hex(16)
+    try:
+        fd = os.open(seed_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another worker may still be writing it
+        for _ in range(50):
+            with open(seed_file, encoding='utf-8') as f:
+                existing = f.read().strip()
+            if existing:
+                return existing
+            time.sleep(0.1)
+        raise ValueError(f"Number engine seed file {seed_file} is empty")
+
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(seed)
+    logger.warning(f"NUMBER_ENGINE_SEED is not set, generated a random seed and saved it to {seed_file}; "
+                   f"copy NUMBER_ENGINE_SEED from that file when running on more than one host")
+    return seed
+
+
+def create_number_engine(language_service):
+    """
+    Create the engine with the seed from NUMBER_ENGINE_SEED.
+
+    Without NUMBER_ENGINE_SEED a random seed is generated once per install and
+    kept in NUMBER_ENGINE_SEED_FILE, so the numbers can't be derived from the date.
+
+    Args:
+        language_service (LanguageService): Source of the prediction templates
+
+    Returns:
+        NumberEngine: The engine
+    """
+    seed = os.environ.get("NUMBER_ENGINE_SEED")
+    if not seed:
+        seed = load_install_seed(os.environ.get("NUMBER_ENGINE_SEED_FILE", "number_engine_seed.txt"))
+    return NumberEngine(language_service, seed=seed)
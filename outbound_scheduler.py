@@ -0,0 +1,450 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from single_flight import acquire_leader_lock
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket rate limiter (not thread-safe, used under the scheduler lock)."""
+
+    def __init__(self, rate, capacity):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate (float): Tokens added per second
+            capacity (float): Maximum number of tokens (burst size)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Get the number of seconds until a token is available (0 if one is available now)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        """Consume one token (call only after wait_time returned 0)."""
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now):
+        """Check whether the bucket has refilled completely (and can be forgotten)."""
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class OutboundScheduler:
+    """
+    Central scheduler for outbound Telegram API calls.
+
+    Calls are persisted to a local SQLite queue before they are sent, so queued
+    replies survive restarts. A dispatcher thread picks the next call that is
+    allowed by the per-chat and global token buckets, interactive replies before
+    broadcasts, and hands it to a small sender pool. Messages for one chat are
+    always sent in the order they were queued.
+
+    Every process sharing the queue file may enqueue, but only one of them
+    drains it: the dispatcher thread first takes a host-wide lock for the
+    queue, so the token buckets (which live in that process) hold for the whole
+    bot. The other processes' dispatchers wait and take over if it exits.
+    """
+
+    # Priority lanes (lower is sent first)
+    INTERACTIVE = 0
+    BROADCAST = 1
+
+    LANE_NAMES = {INTERACTIVE: 'interactive', BROADCAST: 'broadcast'}
+
+    # Claimed calls whose sender died are picked up again after this many seconds
+    CLAIM_TIMEOUT = 120
+
+    # Longest sleep of the dispatcher, which also picks up calls enqueued by other processes
+    POLL_INTERVAL = 0.25
+
+    # Delay before retrying a call after a connection error or 5xx, doubled per attempt up to the maximum
+    RETRY_BACKOFF = 2.0
+    MAX_RETRY_BACKOFF = 300.0
+
+    def __init__(self, client, db_path='outbound_queue.db', per_chat_rate=1.0, global_rate=30.0, num_senders=4,
+                 max_attempts=5):
+        """
+        Initialize the scheduler.
+
+        Args:
+            client (TelegramClient): Client used to perform the API calls
+            db_path (str): Path of the SQLite file holding the persistent queue
+            per_chat_rate (float): Messages per second allowed for a single chat
+            global_rate (float): Messages per second allowed for the whole bot (per process)
+            num_senders (int): Number of concurrent sender threads
+            max_attempts (int): Attempts of a call failing with connection errors or 5xx before it is
+                                moved to the outbound_failed table
+        """
+        self.client = client
+        self.db_path = db_path
+        self.per_chat_rate = per_chat_rate
+        self.global_bucket = TokenBucket(global_rate, max(1.0, global_rate))
+        self.num_senders = num_senders
+        self.max_attempts = max_attempts
+
+        self._chat_buckets = {}
+        self._inflight_chats = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._executor = None
+        self._thread = None
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbound_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                priority INTEGER NOT NULL,
+                chat_id TEXT NOT NULL,
+                method TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                not_before REAL NOT NULL DEFAULT 0,
+                claimed_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_outbound_messages_order ON outbound_messages (priority, id)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_outbound_messages_chat ON outbound_messages (chat_id, priority, id)")
+        # Calls given up on after max_attempts transient failures, kept for inspection
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbound_failed (
+                id INTEGER PRIMARY KEY,
+                priority INTEGER NOT NULL,
+                chat_id TEXT NOT NULL,
+                method TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                attempts INTEGER NOT NULL,
+                error TEXT,
+                failed_at REAL NOT NULL
+            )
+        """)
+        # Resume checkpoints of broadcasts, committed together with the messages they queued
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS broadcast_checkpoints (
+                run_id TEXT PRIMARY KEY,
+                cursor INTEGER NOT NULL,
+                queued INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+        self._stats = {
+            lane: {'sent': 0, 'failed': 0, 'rate_limited': 0, 'retried': 0, 'total_wait_ms': 0.0, 'max_wait_ms': 0.0}
+            for lane in self.LANE_NAMES
+        }
+
+        logger.info(f"Outbound scheduler initialized ({per_chat_rate}/s per chat, {global_rate}/s global)")
+
+    def start(self):
+        """Start the dispatcher thread and sender pool (idempotent)."""
+        with self._lock:
+            if self._thread:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.num_senders, thread_name_prefix="outbound-sender")
+            self._thread = threading.Thread(target=self._dispatch_loop, name="outbound-dispatcher", daemon=True)
+            self._thread.start()
+        logger.info(f"Outbound scheduler started with {self.num_senders} senders")
+
+    def enqueue(self, method, data, priority=INTERACTIVE):
+        """
+        Persist an API call to be sent as soon as the rate limits allow.
+
+        Args:
+            method (str): The Bot API method (e.g. 'sendMessage')
+            data (dict): Form parameters for the method, must include chat_id
+            priority (int): INTERACTIVE or BROADCAST
+
+        Returns:
+            int: The id of the queued call
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO outbound_messages (priority, chat_id, method, payload, enqueued_at) VALUES (?, ?, ?, ?, ?)",
+                (priority, str(data['chat_id']), method, json.dumps(data), time.time())
+            )
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def enqueue_many(self, calls, priority=BROADCAST, checkpoint=None):
+        """
+        Persist several API calls in one transaction.
+
+        Args:
+            calls (list): List of (method, data) tuples
+            priority (int): INTERACTIVE or BROADCAST
+            checkpoint (tuple): Optional (run_id, cursor) saved in the same transaction, so
+                                a resumed broadcast never queues the same calls twice
+
+        Returns:
+            int: The number of queued calls
+        """
+        now = time.time()
+        rows = [(priority, str(data['chat_id']), method, json.dumps(data), now) for method, data in calls]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO outbound_messages (priority, chat_id, method, payload, enqueued_at) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                if checkpoint:
+                    run_id, cursor = checkpoint
+                    self._conn.execute(
+                        """
+                        INSERT INTO broadcast_checkpoints (run_id, cursor, queued, updated_at) VALUES (?, ?, ?, ?)
+                        ON CONFLICT (run_id) DO UPDATE SET
+                            cursor = excluded.cursor,
+                            queued = broadcast_checkpoints.queued + excluded.queued,
+                            updated_at = excluded.updated_at
+                        """,
+                        (run_id, cursor, len(rows), now)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._wakeup.set()
+        return len(rows)
+
+    def get_checkpoint(self, run_id):
+        """
+        Get the saved progress of a broadcast run.
+
+        Returns:
+            tuple: (cursor, queued) or (None, 0) if the run has not started
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT cursor, queued FROM broadcast_checkpoints WHERE run_id = ?", (run_id,)).fetchone()
+        return row if row else (None, 0)
+
+    def pending_count(self):
+        """Get the number of calls still waiting in the queue."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbound_messages").fetchone()[0]
+
+    def _dispatch_loop(self):
+        """Become the process draining the queue, then pick ready calls and hand them to the sender pool forever."""
+        queue_id = hashlib.sha1(os.path.abspath(self.db_path).encode()).hexdigest()[:12]
+        lock_file = acquire_leader_lock(f"outbound-{queue_id}")  # noqa: F841 - held while the thread runs
+        logger.info(f"This process drains the outbound queue {self.db_path} (pid {os.getpid()})")
+        while True:
+            try:
+                delay = self._dispatch_ready()
+            except Exception as e:
+                logger.error(f"Error in outbound dispatcher: {e}")
+                delay = 1.0
+            self._wakeup.wait(timeout=delay)
+            self._wakeup.clear()
+
+    def _dispatch_ready(self):
+        """
+        Dispatch every call allowed by the rate limits right now.
+
+        Returns:
+            float: Seconds to sleep before the next dispatch round
+        """
+        now_wall = time.time()
+        claim_cutoff = now_wall - self.CLAIM_TIMEOUT
+        with self._lock:
+            # Only the first queued call of each chat may go, and only while none of the chat's calls
+            # is claimed (in flight here or in a process that died less than CLAIM_TIMEOUT ago).
+            # Calls backing off after a 429 or a failed attempt hold up the rest of their chat.
+            rows = self._conn.execute(
+                """
+                SELECT id, priority, chat_id, method, payload, enqueued_at, attempts FROM outbound_messages m
+                WHERE id = (SELECT h.id FROM outbound_messages h WHERE h.chat_id = m.chat_id
+                            ORDER BY h.priority, h.id LIMIT 1)
+                  AND not_before <= ?
+                  AND NOT EXISTS (SELECT 1 FROM outbound_messages c WHERE c.chat_id = m.chat_id AND c.claimed_at >= ?)
+                ORDER BY priority, id LIMIT 500
+                """,
+                (now_wall, claim_cutoff)
+            ).fetchall()
+            backing_off = self._conn.execute(
+                "SELECT MIN(not_before) FROM outbound_messages WHERE not_before > ?", (now_wall,)).fetchone()[0]
+
+            next_delay = self.POLL_INTERVAL
+            if backing_off:
+                next_delay = min(next_delay, backing_off - now_wall)
+            now = time.monotonic()
+            for row_id, priority, chat_id, method, payload, enqueued_at, attempts in rows:
+                if chat_id in self._inflight_chats:
+                    continue
+
+                global_wait = self.global_bucket.wait_time(now)
+                if global_wait:
+                    next_delay = min(next_delay, global_wait)
+                    break
+
+                bucket = self._chat_buckets.get(chat_id)
+                if not bucket:
+                    bucket = TokenBucket(self.per_chat_rate, 1.0)
+                    self._chat_buckets[chat_id] = bucket
+                chat_wait = bucket.wait_time(now)
+                if chat_wait:
+                    next_delay = min(next_delay, chat_wait)
+                    continue
+
+                # Claim the row so other processes sharing the queue file skip it
+                claimed = self._conn.execute(
+                    "UPDATE outbound_messages SET claimed_at = ?, attempts = attempts + 1 "
+                    "WHERE id = ? AND (claimed_at IS NULL OR claimed_at < ?)",
+                    (now_wall, row_id, claim_cutoff)
+                ).rowcount
+                if not claimed:
+                    continue
+
+                self.global_bucket.take(now)
+                bucket.take(now)
+                self._inflight_chats.add(chat_id)
+                self._executor.submit(self._send, row_id, priority, chat_id, method, payload, enqueued_at, attempts + 1)
+
+            # Forget chats whose buckets are full again so the dict stays small
+            for idle_chat in [c for c, b in self._chat_buckets.items() if c not in self._inflight_chats and b.is_full(now)]:
+                del self._chat_buckets[idle_chat]
+
+        return next_delay
+
+    def _send(self, row_id, priority, chat_id, method, payload, enqueued_at, attempts):
+        """
+        Perform one queued call and update the queue with its outcome.
+
+        Successful calls and calls Telegram rejected with a 4xx are removed
+        from the queue. Rate limited calls wait for retry_after; 5xx and
+        failures the client marks retryable (the request never went out, or
+        the method is idempotent) are retried with exponential backoff and
+        moved to outbound_failed after max_attempts. A read timeout of e.g.
+        sendMessage is final: Telegram has usually delivered it already.
+        """
+        try:
+            response_json = self.client.call(method, json.loads(payload), max_retries=0)
+        except Exception as e:
+            response_json = {"ok": False, "error": str(e), "retryable": False}
+
+        wait_ms = (time.time() - enqueued_at) * 1000
+        with self._lock:
+            self._inflight_chats.discard(chat_id)
+            stats = self._stats[priority]
+
+            ok = response_json.get('ok')
+            retry_after = response_json.get('parameters', {}).get('retry_after')
+            error_code = response_json.get('error_code')
+            if error_code is not None:
+                transient = not ok and error_code >= 500
+            else:
+                # No response: only retry if the call provably wasn't sent or may be repeated
+                transient = not ok and response_json.get('retryable', False)
+            if not ok and retry_after:
+                # Rate limited by Telegram, keep the call and try again later (not counted as an attempt)
+                stats['rate_limited'] += 1
+                self._conn.execute(
+                    "UPDATE outbound_messages SET claimed_at = NULL, not_before = ?, attempts = attempts - 1 "
+                    "WHERE id = ?",
+                    (time.time() + retry_after, row_id)
+                )
+                logger.warning(f"Outbound {method} to {chat_id} rate limited, retrying in {retry_after}s")
+            elif transient and attempts < self.max_attempts:
+                stats['retried'] += 1
+                delay = min(self.MAX_RETRY_BACKOFF, self.RETRY_BACKOFF * 2 ** (attempts - 1))
+                self._conn.execute(
+                    "UPDATE outbound_messages SET claimed_at = NULL, not_before = ? WHERE id = ?",
+                    (time.time() + delay, row_id)
+                )
+                logger.warning(f"Outbound {method} to {chat_id} failed (attempt {attempts}/{self.max_attempts}), "
+                               f"retrying in {delay:.0f}s: {response_json}")
+            elif transient:
+                stats['failed'] += 1
+                self._conn.execute("BEGIN")
+                try:
+                    self._conn.execute(
+                        """
+                        INSERT OR REPLACE INTO outbound_failed
+                            (id, priority, chat_id, method, payload, enqueued_at, attempts, error, failed_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        (row_id, priority, chat_id, method, payload, enqueued_at, attempts,
+                         json.dumps(response_json), time.time())
+                    )
+                    self._conn.execute("DELETE FROM outbound_messages WHERE id = ?", (row_id,))
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                logger.error(f"Outbound {method} to {chat_id} failed after {attempts} attempts, "
+                             f"moved to outbound_failed: {response_json}")
+            else:
+                if ok:
+                    stats['sent'] += 1
+                else:
+                    stats['failed'] += 1
+                    logger.error(f"Outbound {method} to {chat_id} failed: {response_json}")
+                stats['total_wait_ms'] += wait_ms
+                stats['max_wait_ms'] = max(stats['max_wait_ms'], wait_ms)
+                self._conn.execute("DELETE FROM outbound_messages WHERE id = ?", (row_id,))
+
+        self._wakeup.set()
+
+    def get_metrics(self):
+        """
+        Get queue sizes and per-lane queue wait times.
+
+        Returns:
+            dict: Metrics per priority lane
+        """
+        with self._lock:
+            pending = dict(self._conn.execute(
+                "SELECT priority, COUNT(*) FROM outbound_messages GROUP BY priority").fetchall())
+            metrics = {}
+            for lane, name in self.LANE_NAMES.items():
+                stats = self._stats[lane]
+                done = stats['sent'] + stats['failed']
+                metrics[name] = {
+                    'pending': pending.get(lane, 0),
+                    'sent': stats['sent'],
+                    'failed': stats['failed'],
+                    'rate_limited': stats['rate_limited'],
+                    'retried': stats['retried'],
+                    'avg_wait_ms': round(stats['total_wait_ms'] / done, 2) if done else 0.0,
+                    'max_wait_ms': round(stats['max_wait_ms'], 2),
+                }
+            metrics['inflight_chats'] = len(self._inflight_chats)
+            metrics['failed_calls'] = self._conn.execute("SELECT COUNT(*) FROM outbound_failed").fetchone()[0]
+            return metrics
+
+
+def create_outbound_scheduler(client):
+    """Create an outbound scheduler configured from the environment (not started)."""
+    return OutboundScheduler(
+        client,
+        db_path=os.environ.get("OUTBOUND_QUEUE_DB", "outbound_queue.db"),
+        per_chat_rate=float(os.environ.get("TELEGRAM_CHAT_RATE", 1)),
+        global_rate=float(os.environ.get("TELEGRAM_GLOBAL_RATE", 30)),
+        num_senders=int(os.environ.get("OUTBOUND_SENDERS", 4)),
+        max_attempts=int(os.environ.get("OUTBOUND_MAX_ATTEMPTS", 5))
+    )
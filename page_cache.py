@@ -0,0 +1,122 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PageCache:
+    """
+    Local SQLite record of the pages the scraper downloaded.
+
+    For each URL it keeps the ETag and Last-Modified validators used for
+    conditional requests, a hash and the size of the raw body, and how long the
+    page took to parse, so unchanged pages can be recognized without parsing
+    them and the skipped work can be reported.
+    """
+
+    def __init__(self, db_path='page_cache.db'):
+        """
+        Initialize the page cache.
+
+        Args:
+            db_path (str): Path of the SQLite file
+        """
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body_hash TEXT NOT NULL,
+                body_size INTEGER NOT NULL,
+                parse_ms REAL NOT NULL DEFAULT 0,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def body_hash(body):
+        """
+        Hash a raw response body.
+
+        Args:
+            body (bytes): The response body
+
+        Returns:
+            str: Hex digest of the body
+        """
+        return hashlib.sha256(body).hexdigest()
+
+    def get(self, url):
+        """
+        Get the stored record of a page.
+
+        Args:
+            url (str): The page URL
+
+        Returns:
+            dict: The record (etag, last_modified, body_hash, body_size, parse_ms), or None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, body_hash, body_size, parse_ms FROM pages WHERE url = ?",
+                (url,)
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            'etag': row[0],
+            'last_modified': row[1],
+            'body_hash': row[2],
+            'body_size': row[3],
+            'parse_ms': row[4]
+        }
+
+    def set(self, url, etag, last_modified, body_hash, body_size, parse_ms=None):
+        """
+        Store the record of a downloaded page.
+
+        Args:
+            url (str): The page URL
+            etag (str): The ETag response header
+            last_modified (str): The Last-Modified response header
+            body_hash (str): Hash of the raw body
+            body_size (int): Size of the raw body in bytes
+            parse_ms (float): Time it took to parse the page (None keeps the stored value)
+        """
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO pages (url, etag, last_modified, body_hash, body_size, parse_ms, fetched_at)
+                VALUES (?, ?, ?, ?, ?, COALESCE(?, 0), ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    body_hash = excluded.body_hash,
+                    body_size = excluded.body_size,
+                    parse_ms = COALESCE(?, pages.parse_ms),
+                    fetched_at = excluded.fetched_at
+                """,
+                (url, etag, last_modified, body_hash, body_size, parse_ms, time.time(), parse_ms)
+            )
+
+
+def create_page_cache():
+    """
+    Create the page cache at the path configured by SCRAPER_PAGE_CACHE_DB.
+
+    Returns:
+        PageCache: The page cache, or None when SCRAPER_PAGE_CACHE_DB is set to an empty value
+    """
+    db_path = os.environ.get("SCRAPER_PAGE_CACHE_DB", "page_cache.db")
+    if not db_path:
+        return None
+    return PageCache(db_path)
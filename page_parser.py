@@ -0,0 +1,172 @@
+import os
+import logging
+from bs4 import BeautifulSoup, SoupStrainer
+
+logger = logging.getLogger(__name__)
+
+# Only these parts of the pgsoft.com pages are ever read
+GAME_CARD_CLASSES = ['game-card']
+GAME_DETAIL_CLASSES = ['game-detail-title', 'game-description', 'game-info-item', 'game-banner', 'game-feature']
+
+
+class PageParser:
+    """
+    Base class for extracting the scraper's fields from pgsoft.com pages.
+
+    Backends return plain dictionaries, so the scraper doesn't depend on the
+    tree type of any particular HTML library.
+    """
+
+    name = None
+
+    def parse_game_cards(self, html):
+        """
+        Extract the game cards from the game list page.
+
+        Args:
+            html (str): The game list page HTML
+
+        Returns:
+            list: One dict per card with href, image_src and title (each may be None)
+        """
+        raise NotImplementedError
+
+    def parse_game_detail(self, html):
+        """
+        Extract the fields of a game detail page.
+
+        Args:
+            html (str): The detail page HTML
+
+        Returns:
+            dict: name, image_src and description (None if missing), and the
+                  info_items and features texts (lists)
+        """
+        raise NotImplementedError
+
+
+class SoupPageParser(PageParser):
+    """BeautifulSoup backend that only builds the tree for the elements we read."""
+
+    def __init__(self, features='html.parser'):
+        """
+        Initialize the parser.
+
+        Args:
+            features (str): The BeautifulSoup tree builder ('lxml' or 'html.parser')
+        """
+        self.features = features
+        self.name = features
+        self._card_strainer = SoupStrainer(class_=GAME_CARD_CLASSES)
+        self._detail_strainer = SoupStrainer(class_=GAME_DETAIL_CLASSES)
+
+    def parse_game_cards(self, html):
+        soup = BeautifulSoup(html, self.features, parse_only=self._card_strainer)
+        cards = []
+        for card in soup.select('.game-card'):
+            link = card.find('a')
+            image = card.find('img')
+            title = card.select_one('.game-card-title')
+            cards.append({
+                'href': link.get('href') if link else None,
+                'image_src': image.get('src') if image else None,
+                'title': title.text.strip() if title else None
+            })
+        return cards
+
+    def parse_game_detail(self, html):
+        soup = BeautifulSoup(html, self.features, parse_only=self._detail_strainer)
+        name = soup.select_one('.game-detail-title h1')
+        image = soup.select_one('.game-banner img')
+        description = soup.select_one('.game-description')
+        return {
+            'name': name.text.strip() if name else None,
+            'image_src': image.get('src') if image else None,
+            'description': description.text.strip() if description else None,
+            'info_items': [item.text for item in soup.select('.game-info-item')],
+            'features': [feature.text for feature in soup.select('.game-feature')]
+        }
+
+
+class SelectolaxPageParser(PageParser):
+    """selectolax (Lexbor) backend, parses the whole page but much faster than BeautifulSoup."""
+
+    name = 'selectolax'
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self._parser = LexborHTMLParser
+
+    def parse_game_cards(self, html):
+        tree = self._parser(html)
+        cards = []
+        for card in tree.css('.game-card'):
+            link = card.css_first('a')
+            image = card.css_first('img')
+            title = card.css_first('.game-card-title')
+            cards.append({
+                'href': link.attributes.get('href') if link else None,
+                'image_src': image.attributes.get('src') if image else None,
+                'title': title.text().strip() if title else None
+            })
+        return cards
+
+    def parse_game_detail(self, html):
+        tree = self._parser(html)
+        name = tree.css_first('.game-detail-title h1')
+        image = tree.css_first('.game-banner img')
+        description = tree.css_first('.game-description')
+        return {
+            'name': name.text().strip() if name else None,
+            'image_src': image.attributes.get('src') if image else None,
+            'description': description.text().strip() if description else None,
+            'info_items': [item.text() for item in tree.css('.game-info-item')],
+            'features': [feature.text() for feature in tree.css('.game-feature')]
+        }
+
+
+def available_backends():
+    """
+    List the parser backends that can be used in this environment.
+
+    Returns:
+        list: Backend names, fastest first
+    """
+    backends = []
+    try:
+        import selectolax.lexbor  # noqa: F401
+        backends.append('selectolax')
+    except ImportError:
+        pass
+    try:
+        import lxml  # noqa: F401
+        backends.append('lxml')
+    except ImportError:
+        pass
+    backends.append('html.parser')
+    return backends
+
+
+def create_page_parser(backend=None):
+    """
+    Create the page parser configured by the SCRAPER_PARSER environment variable.
+
+    Args:
+        backend (str): 'auto', 'selectolax', 'lxml' or 'html.parser' (defaults to SCRAPER_PARSER or 'auto').
+                       'auto' uses lxml when it is installed and html.parser otherwise.
+
+    Returns:
+        PageParser: The parser
+    """
+    backend = (backend or os.environ.get("SCRAPER_PARSER", "auto")).lower()
+    available = available_backends()
+    if backend == 'auto':
+        backend = 'lxml' if 'lxml' in available else 'html.parser'
+    elif backend not in available:
+        logger.warning(f"HTML parser backend {backend} is not available, using html.parser")
+        backend = 'html.parser'
+
+    logger.info(f"Using {backend} to parse scraped pages")
+    if backend == 'selectolax':
+        return SelectolaxPageParser()
+    return SoupPageParser(backend)
@@ -1,10 +1,19 @@
+import os
 import logging
 import re
+import time
+import threading
 import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 from models import PGSoftGame
 from app import db
+from game_info_cache import GameInfoTextCache, create_game_info_cache
+from page_cache import PageCache, create_page_cache
+from page_parser import create_page_parser
+from game_catalog import lookup_game, forget_game_lookups
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,10 +24,143 @@ class PGSoftScraper:
     
     BASE_URL = "https://www.pgsoft.com/en/games/"
     
-    def __init__(self):
-        """Initialize the PGSoft scraper."""
+    def __init__(self, game_info_cache=None, max_workers=None, per_host_limit=None, timeout=None,
+                 page_cache=None, parser=None):
+        """
+        Initialize the PGSoft scraper.
+        
+        Args:
+            game_info_cache (GameInfoTextCache): Cache of generated texts to invalidate when game data changes
+            max_workers (int): Threads used by fetch_many (defaults to SCRAPER_WORKERS or 8)
+            per_host_limit (int): Maximum concurrent requests per host (defaults to SCRAPER_PER_HOST or 4)
+            timeout (float): Per-request timeout in seconds (defaults to SCRAPER_TIMEOUT or 10)
+            page_cache (PageCache): Validators and body hashes for conditional requests
+                                    (defaults to the SCRAPER_PAGE_CACHE_DB file)
+            parser (PageParser): HTML parser backend (defaults to the SCRAPER_PARSER backend)
+        """
+        self.game_info_cache = game_info_cache or create_game_info_cache()
+        self.max_workers = max_workers or int(os.environ.get("SCRAPER_WORKERS", 8))
+        self.per_host_limit = per_host_limit or int(os.environ.get("SCRAPER_PER_HOST", 4))
+        self.timeout = timeout or float(os.environ.get("SCRAPER_TIMEOUT", 10))
+        
+        # One pooled keep-alive session shared by all fetches
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(self.max_workers, self.per_host_limit))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        self._host_semaphores = {}
+        self._host_semaphores_lock = threading.Lock()
+        
+        self.parser = parser or create_page_parser()
+        
+        # Detail pages that did not change since the last download are neither parsed nor stored again
+        self.page_cache = page_cache or create_page_cache()
+        self._stats = {
+            'pages_fetched': 0,
+            'pages_not_modified': 0,
+            'pages_unchanged': 0,
+            'bytes_downloaded': 0,
+            'bytes_saved': 0,
+            'parse_ms': 0.0,
+            'parse_ms_saved': 0.0
+        }
+        self._stats_lock = threading.Lock()
         logger.info("PGSoft scraper initialized")
     
+    def _host_semaphore(self, url):
+        """Get the semaphore limiting concurrent requests to the URL's host."""
+        host = urlparse(url).netloc
+        with self._host_semaphores_lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_semaphores[host] = semaphore
+            return semaphore
+    
+    def _fetch_page(self, url, **kwargs):
+        """Fetch a page through the shared session, respecting the per-host limit."""
+        with self._host_semaphore(url):
+            return self.session.get(url, timeout=self.timeout, **kwargs)
+    
+    def _count(self, **amounts):
+        """Add to the fetch statistics."""
+        with self._stats_lock:
+            for key, amount in amounts.items():
+                self._stats[key] += amount
+    
+    def get_stats(self):
+        """
+        Get the fetch statistics, including the downloads and parsing saved by conditional requests.
+        
+        Returns:
+            dict: Page counts, bytes downloaded/saved and parse milliseconds spent/saved
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['parse_ms'] = round(stats['parse_ms'], 2)
+        stats['parse_ms_saved'] = round(stats['parse_ms_saved'], 2)
+        return stats
+    
+    def _fetch_detail_page(self, url, conditional):
+        """
+        Fetch a game detail page, conditionally when we have seen it before.
+        
+        Args:
+            url (str): The detail page URL
+            conditional (bool): Send the stored validators and compare the body hash
+                                (only when the game's data is already in the database)
+            
+        Returns:
+            tuple: (response, changed) where changed is False for a 304 or a body
+                   identical to the last download, which need no parsing
+        """
+        record = self.page_cache.get(url) if self.page_cache and conditional else None
+        headers = {}
+        if record:
+            if record['etag']:
+                headers['If-None-Match'] = record['etag']
+            if record['last_modified']:
+                headers['If-Modified-Since'] = record['last_modified']
+        
+        response = self._fetch_page(url, headers=headers, allow_redirects=True)
+        
+        if response.status_code == 304 and record:
+            self._count(pages_fetched=1, pages_not_modified=1,
+                        bytes_saved=record['body_size'], parse_ms_saved=record['parse_ms'])
+            return response, False
+        
+        self._count(pages_fetched=1, bytes_downloaded=len(response.content))
+        if response.status_code == 200 and record and PageCache.body_hash(response.content) == record['body_hash']:
+            self._count(pages_unchanged=1, parse_ms_saved=record['parse_ms'])
+            self._remember_page(url, response)
+            return response, False
+        return response, True
+    
+    def _remember_page(self, url, response, parse_ms=None):
+        """Store a downloaded page's validators and body hash for the next conditional request."""
+        if not self.page_cache or response.status_code != 200:
+            return
+        self.page_cache.set(
+            url,
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified'),
+            PageCache.body_hash(response.content),
+            len(response.content),
+            parse_ms
+        )
+    
+    def _touch_games(self, game_ids):
+        """Mark games' stored data as verified now, without rewriting it."""
+        try:
+            PGSoftGame.query.filter(PGSoftGame.game_id.in_(game_ids)).update(
+                {'last_updated': datetime.utcnow()}, synchronize_session=False)
+            db.session.commit()
+            forget_game_lookups(game_ids)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to touch games {game_ids}: {e}")
+    
     def fetch_game_list(self):
         """
         Fetch the list of PGSoft games from their official website.
@@ -28,46 +170,26 @@ class PGSoftScraper:
         """
         try:
             logger.info(f"Fetching game list from {self.BASE_URL}")
-            response = requests.get(self.BASE_URL)
+            response = self._fetch_page(self.BASE_URL)
             if response.status_code != 200:
                 logger.error(f"Failed to fetch game list: {response.status_code}")
                 return []
                 
-            soup = BeautifulSoup(response.text, 'html.parser')
-            game_elements = soup.select('.game-card')
-            
             games = []
-            for game_element in game_elements:
+            for card in self.parser.parse_game_cards(response.text):
                 try:
-                    # Extract game details
-                    game_link = game_element.find('a')
-                    if not game_link:
-                        continue
-                        
-                    # Get href attribute safely
-                    detail_url = None
-                    if game_link and hasattr(game_link, 'attrs') and 'href' in game_link.attrs:
-                        detail_url = game_link['href']
-                    
+                    # Cards without a detail link can't be looked up
+                    detail_url = card['href']
                     if not detail_url:
                         continue
                         
                     game_id = self._extract_game_id(detail_url)
                     
-                    # Get src attribute safely
-                    image_element = game_element.find('img')
-                    image_url = None
-                    if image_element and hasattr(image_element, 'attrs') and 'src' in image_element.attrs:
-                        image_url = image_element['src']
-                    
-                    name_element = game_element.select_one('.game-card-title')
-                    name = name_element.text.strip() if name_element else "Unknown Game"
-                    
                     # Add to games list
                     games.append({
                         'game_id': game_id,
-                        'name': name,
-                        'image_url': image_url,
+                        'name': card['title'] or "Unknown Game",
+                        'image_url': card['image_src'],
                         'detail_url': detail_url,
                     })
                 except Exception as e:
@@ -92,10 +214,10 @@ class PGSoftScraper:
         """
         try:
             # Check if we have valid cached data
-            cached_game = PGSoftGame.query.filter_by(game_id=game_id).first()
-            if cached_game and PGSoftGame.is_cache_valid(game_id):
+            lookup = lookup_game(game_id)
+            if lookup['fresh']:
                 logger.info(f"Using cached data for game {game_id}")
-                return cached_game.to_dict()
+                return lookup['game']
             
             # Format the game name from the ID for better display
             formatted_name = self._format_game_name_from_id(game_id)
@@ -115,33 +237,28 @@ class PGSoftScraper:
                 'last_updated': datetime.utcnow()
             }
             
+            response = None
             try:
-                response = requests.get(detail_url, allow_redirects=True, timeout=10)
+                response, changed = self._fetch_detail_page(detail_url, conditional=lookup['game'] is not None)
+                if not changed:
+                    # The page is the same as when we stored the game, keep the stored data
+                    logger.info(f"Game page unchanged for {game_id}, keeping stored data")
+                    self._touch_games([game_id])
+                    return lookup_game(game_id)['game']
+                
                 if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # Extract game information
-                    name_element = soup.select_one('.game-detail-title h1')
-                    if name_element:
-                        game_data['name'] = name_element.text.strip()
-                    
-                    image_element = soup.select_one('.game-banner img')
-                    if image_element and hasattr(image_element, 'attrs') and 'src' in image_element.attrs:
-                        game_data['image_url'] = image_element['src']
-                    
-                    description_element = soup.select_one('.game-description')
-                    if description_element:
-                        game_data['description'] = description_element.text.strip()
-                    
-                    # Try to find RTP information
-                    rtp = self._extract_rtp_from_page(soup)
-                    if rtp != "N/A":
-                        game_data['rtp'] = rtp
+                    started = time.monotonic()
+                    self._parse_game_details(response.text, game_data)
+                    parse_ms = (time.monotonic() - started) * 1000
+                    self._count(parse_ms=parse_ms)
             except Exception as e:
                 logger.error(f"Error parsing game details page: {e}")
+                response = None
             
             # Update or create the database record
             self._update_game_database(game_data)
+            if response is not None:
+                self._remember_page(detail_url, response, parse_ms=parse_ms if response.status_code == 200 else None)
             
             return game_data
         except Exception as e:
@@ -166,6 +283,186 @@ class PGSoftScraper:
                 
             return basic_data
             
+    def _parse_game_details(self, html, game_data):
+        """
+        Fill game_data with the information found on a game detail page.
+        
+        Args:
+            html (str): The detail page HTML
+            game_data (dict): Game data with fallback values, updated in place
+        """
+        details = self.parser.parse_game_detail(html)
+        
+        # Extract game information
+        if details['name']:
+            game_data['name'] = details['name']
+        
+        if details['image_src']:
+            game_data['image_url'] = details['image_src']
+        
+        if details['description'] is not None:
+            game_data['description'] = details['description']
+        
+        # Try to find RTP information
+        rtp = self._extract_rtp_from_page(details)
+        if rtp != "N/A":
+            game_data['rtp'] = rtp
+    
+    def _fetch_and_parse(self, game_id, conditional=False):
+        """
+        Fetch and parse one game detail page (runs on a fetch_many worker thread, no database access).
+        
+        Args:
+            game_id (str): The game ID
+            conditional (bool): Whether the game is stored and the page may be skipped if unchanged
+        
+        Returns:
+            dict: The per-game result without the database timing
+        """
+        detail_url = f"{self.BASE_URL}{game_id}/"
+        result = {
+            'game_id': game_id,
+            'ok': False,
+            'status': None,
+            'data': None,
+            'error': None,
+            'changed': True,
+            'response': None,
+            'fetch_ms': 0.0,
+            'parse_ms': 0.0,
+            'db_ms': 0.0
+        }
+        
+        started = time.monotonic()
+        try:
+            response, changed = self._fetch_detail_page(detail_url, conditional)
+        except requests.RequestException as e:
+            result['fetch_ms'] = round((time.monotonic() - started) * 1000, 2)
+            result['error'] = str(e)
+            return result
+        result['fetch_ms'] = round((time.monotonic() - started) * 1000, 2)
+        result['status'] = response.status_code
+        if not changed:
+            result['ok'] = True
+            result['changed'] = False
+            return result
+        if response.status_code != 200:
+            result['error'] = f"HTTP {response.status_code}"
+            return result
+        
+        game_data = {
+            'game_id': game_id,
+            'name': self._format_game_name_from_id(game_id),
+            'description': "",
+            'image_url': self._get_fallback_image_url(game_id),
+            'rtp': "N/A",
+            'detail_url': detail_url,
+            'last_updated': datetime.utcnow()
+        }
+        started = time.monotonic()
+        try:
+            self._parse_game_details(response.text, game_data)
+        except Exception as e:
+            result['error'] = f"Parse error: {e}"
+            return result
+        finally:
+            result['parse_ms'] = round((time.monotonic() - started) * 1000, 2)
+            self._count(parse_ms=result['parse_ms'])
+        
+        result['ok'] = True
+        result['data'] = game_data
+        result['response'] = response
+        return result
+    
+    def fetch_many(self, game_ids, force=False):
+        """
+        Fetch the details of many games concurrently.
+        
+        Pages are downloaded and parsed on a thread pool (bounded by max_workers and
+        the per-host limit); the database is only written from the calling thread,
+        which needs an application context. Games whose cached data is still valid
+        are skipped unless force is set. Failed fetches leave the stored data alone,
+        and stored games whose page did not change are only marked as verified.
+        
+        Args:
+            game_ids (list): IDs of the games to fetch
+            force (bool): Refetch games even if their cached data is still valid
+            
+        Returns:
+            list: One result per game in input order, each a dict with game_id, ok,
+                  cached, changed, status, data, error, fetch_ms, parse_ms and db_ms
+        """
+        started = time.monotonic()
+        game_ids = list(dict.fromkeys(game_ids))
+        
+        rows = PGSoftGame.query.filter(PGSoftGame.game_id.in_(game_ids)).all() if game_ids else []
+        stored = {row.game_id: row.to_dict() for row in rows}
+        
+        cached = {}
+        if not force:
+            valid_since = datetime.utcnow() - timedelta(days=30)
+            cached = {
+                row.game_id: stored[row.game_id] for row in rows
+                if row.last_updated and row.last_updated >= valid_since
+            }
+        
+        to_fetch = [game_id for game_id in game_ids if game_id not in cached]
+        fetched = {}
+        if to_fetch:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(to_fetch))) as executor:
+                conditional = [game_id in stored for game_id in to_fetch]
+                for result in executor.map(self._fetch_and_parse, to_fetch, conditional):
+                    fetched[result['game_id']] = result
+        
+        results = []
+        changed, unchanged = [], []
+        for game_id in game_ids:
+            if game_id in cached:
+                results.append({
+                    'game_id': game_id, 'ok': True, 'cached': True, 'changed': False, 'status': None,
+                    'data': cached[game_id], 'error': None, 'fetch_ms': 0.0, 'parse_ms': 0.0, 'db_ms': 0.0
+                })
+                continue
+            
+            result = fetched[game_id]
+            result['cached'] = False
+            if result['ok'] and not result['changed']:
+                result['data'] = stored[game_id]
+                unchanged.append(result)
+            elif result['ok']:
+                changed.append(result)
+            else:
+                logger.warning(f"Failed to fetch game {game_id}: {result['error']}")
+            results.append(result)
+        
+        # Write the whole batch at once; each game is charged its share of the write time
+        if unchanged:
+            db_started = time.monotonic()
+            self._touch_games([result['game_id'] for result in unchanged])
+            db_ms = round((time.monotonic() - db_started) * 1000 / len(unchanged), 2)
+            for result in unchanged:
+                result['db_ms'] = db_ms
+        if changed:
+            try:
+                summary = self.upsert_games([result['data'] for result in changed])
+                for result in changed:
+                    result['db_ms'] = round(summary['elapsed_ms'] / len(changed), 2)
+                    self._remember_page(result['data']['detail_url'], result['response'], parse_ms=result['parse_ms'])
+            except Exception as e:
+                logger.error(f"Failed to store fetched games: {e}")
+                for result in changed:
+                    result['ok'] = False
+                    result['error'] = f"Database error: {e}"
+        for result in results:
+            result.pop('response', None)
+        
+        logger.info(
+            f"Fetched {sum(1 for r in results if r['ok'] and not r['cached'])} games "
+            f"({len(cached)} cached, {sum(1 for r in results if r['ok'] and not r['cached'] and not r['changed'])} "
+            f"unchanged, {sum(1 for r in results if not r['ok'])} failed) in {time.monotonic() - started:.2f}s; "
+            f"totals: {self.get_stats()}")
+        return results
+    
     def _format_game_name_from_id(self, game_id):
         """Format a readable game name from the game ID."""
         if not game_id:
@@ -212,32 +509,29 @@ class PGSoftScraper:
             return match.group(1)
         return None
     
-    def _extract_rtp_from_page(self, soup):
-        """Extract the RTP information from the game detail page."""
+    def _extract_rtp_from_page(self, details):
+        """Extract the RTP information from the parsed game detail page."""
         try:
             # Look for RTP in various parts of the page
             # Method 1: Look for specific sections that might contain RTP
-            rtp_sections = soup.select('.game-info-item')
-            for section in rtp_sections:
-                text = section.text.lower()
+            for section_text in details['info_items']:
+                text = section_text.lower()
                 if 'rtp' in text:
                     match = re.search(r'(\d+\.\d+)%', text)
                     if match:
                         return f"{match.group(1)}%"
             
             # Method 2: Look for RTP in the game description
-            description = soup.select_one('.game-description')
-            if description:
-                text = description.text.lower()
+            if details['description']:
+                text = details['description'].lower()
                 if 'rtp' in text:
                     match = re.search(r'rtp\D*(\d+\.\d+)%', text, re.IGNORECASE)
                     if match:
                         return f"{match.group(1)}%"
             
             # Method 3: Search for any mention of percentage in game features
-            features = soup.select('.game-feature')
-            for feature in features:
-                text = feature.text.lower()
+            for feature_text in details['features']:
+                text = feature_text.lower()
                 if 'rtp' in text or 'return to player' in text:
                     match = re.search(r'(\d+\.\d+)%', text)
                     if match:
@@ -251,19 +545,92 @@ class PGSoftScraper:
     def _update_game_database(self, game_data):
         """Update or create a game record in the database."""
         try:
-            game = PGSoftGame.query.filter_by(game_id=game_data['game_id']).first()
-            
-            if game:
-                # Update existing record
-                for key, value in game_data.items():
-                    setattr(game, key, value)
-            else:
-                # Create new record
-                game = PGSoftGame(**game_data)
-                db.session.add(game)
-                
-            db.session.commit()
+            self.upsert_games([game_data])
             logger.info(f"Updated database for game {game_data['name']}")
         except Exception as e:
-            db.session.rollback()
-            logger.error(f"Failed to update database: {e}")
\ No newline at end of file
+            logger.error(f"Failed to update database: {e}")
+    
+    def upsert_games(self, games, chunk_size=500):
+        """
+        Insert or update many games, one statement per chunk.
+        
+        Uses INSERT ... ON CONFLICT (game_id) DO UPDATE on PostgreSQL and SQLite
+        (falling back to per-row merges on other databases). Cached game info
+        texts of games whose data changed are invalidated in the same transaction.
+        
+        Args:
+            games (list): Game data dicts with game_id and any of name, description,
+                          image_url, rtp, detail_url and last_updated
+            chunk_size (int): Games written per statement
+            
+        Returns:
+            dict: Summary with the number of rows and chunks and the elapsed milliseconds
+            
+        Raises:
+            Exception: If writing fails (the chunk is rolled back)
+        """
+        started = time.monotonic()
+        columns = [column.name for column in PGSoftGame.__table__.columns if column.name != 'id']
+        now = datetime.utcnow()
+        
+        # One row per game (the last one wins), with only real columns and a timestamp
+        rows = {}
+        for game in games:
+            row = {key: value for key, value in game.items() if key in columns}
+            if not isinstance(row.get('last_updated'), datetime):
+                row['last_updated'] = now
+            rows[row['game_id']] = row
+        rows = list(rows.values())
+        
+        dialect = db.engine.dialect.name
+        chunks = 0
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            try:
+                # Generated texts describing the old data are no longer valid
+                existing = PGSoftGame.query.filter(PGSoftGame.game_id.in_([row['game_id'] for row in chunk])).all()
+                new_hashes = {row['game_id']: GameInfoTextCache.source_hash(row) for row in chunk}
+                changed = [
+                    game.game_id for game in existing
+                    if GameInfoTextCache.source_hash(game.to_dict()) != new_hashes[game.game_id]
+                ]
+                if changed:
+                    self.game_info_cache.invalidate_many(changed)
+                
+                if dialect in ('postgresql', 'sqlite'):
+                    if dialect == 'postgresql':
+                        from sqlalchemy.dialects.postgresql import insert
+                    else:
+                        from sqlalchemy.dialects.sqlite import insert
+                    
+                    # Rows may carry different columns, group them so every insert has the same shape
+                    by_shape = {}
+                    for row in chunk:
+                        by_shape.setdefault(tuple(sorted(row)), []).append(row)
+                    for shape, shaped_rows in by_shape.items():
+                        statement = insert(PGSoftGame.__table__).values(shaped_rows)
+                        statement = statement.on_conflict_do_update(
+                            index_elements=['game_id'],
+                            set_={key: statement.excluded[key] for key in shape if key != 'game_id'}
+                        )
+                        db.session.execute(statement)
+                else:
+                    for row in chunk:
+                        game = PGSoftGame.query.filter_by(game_id=row['game_id']).first()
+                        if game:
+                            for key, value in row.items():
+                                setattr(game, key, value)
+                        else:
+                            db.session.add(PGSoftGame(**row))
+                
+                db.session.commit()
+                forget_game_lookups([row['game_id'] for row in chunk])
+                chunks += 1
+            except Exception:
+                db.session.rollback()
+                raise
+        
+        elapsed_ms = round((time.monotonic() - started) * 1000, 2)
+        if len(rows) > 1:
+            logger.info(f"Upserted {len(rows)} games in {chunks} chunks in {elapsed_ms}ms")
+        return {'rows': len(rows), 'chunks': chunks, 'elapsed_ms': elapsed_ms}
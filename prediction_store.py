@@ -0,0 +1,156 @@
+import os
+import logging
+import threading
+import tempfile
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionStore:
+    """Base class for storing daily predictions keyed by (lottery type, language, date)."""
+
+    def get(self, lottery_type, language_code, prediction_date):
+        """
+        Get a stored prediction.
+
+        Args:
+            lottery_type (str): The lottery type ('vietnam', '4d', 'thai', 'indo')
+            language_code (str): The language code ('vi', 'en', 'th', 'zh')
+            prediction_date (date): The day the prediction is for
+
+        Returns:
+            str: The prediction text, or None if there is no entry
+        """
+        raise NotImplementedError
+
+    def set(self, lottery_type, language_code, prediction_date, prediction):
+        """
+        Store a prediction, replacing any existing entry for the same key.
+
+        Args:
+            lottery_type (str): The lottery type
+            language_code (str): The language code
+            prediction_date (date): The day the prediction is for
+            prediction (str): The prediction text
+        """
+        raise NotImplementedError
+
+
+class MemoryPredictionStore(PredictionStore):
+    """Per-process in-memory store (not shared between workers)."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, lottery_type, language_code, prediction_date):
+        return self._entries.get((lottery_type, language_code, prediction_date))
+
+    def set(self, lottery_type, language_code, prediction_date, prediction):
+        with self._lock:
+            # Drop entries older than the day before so the dict doesn't grow forever
+            # (today's entries must survive while tomorrow's are being pre-generated)
+            oldest_kept = prediction_date - timedelta(days=1)
+            for key in [key for key in self._entries if key[2] < oldest_kept]:
+                del self._entries[key]
+            self._entries[(lottery_type, language_code, prediction_date)] = prediction
+
+
+class DatabasePredictionStore(PredictionStore):
+    """Store backed by the daily_predictions table on the shared SQLAlchemy database."""
+
+    def __init__(self):
+        from app import app, db
+        from models import DailyPrediction
+        self.app = app
+        self.db = db
+        self.model = DailyPrediction
+
+    def get(self, lottery_type, language_code, prediction_date):
+        with self.app.app_context():
+            entry = self.model.query.filter_by(
+                lottery_type=lottery_type,
+                language_code=language_code,
+                prediction_date=prediction_date
+            ).first()
+            return entry.prediction if entry else None
+
+    def set(self, lottery_type, language_code, prediction_date, prediction):
+        with self.app.app_context():
+            key = {
+                'lottery_type': lottery_type,
+                'language_code': language_code,
+                'prediction_date': prediction_date
+            }
+            try:
+                self.db.session.add(self.model(prediction=prediction, **key))
+                self.db.session.commit()
+            except IntegrityError:
+                # Another worker stored the same slot first, overwrite it
+                self.db.session.rollback()
+                self.model.query.filter_by(**key).update({
+                    'prediction': prediction,
+                    'created_at': datetime.utcnow()
+                })
+                self.db.session.commit()
+            except Exception:
+                self.db.session.rollback()
+                raise
+
+
+class FilePredictionStore(PredictionStore):
+    """Store that keeps one file per entry in a directory shared by all workers on the host."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, lottery_type, language_code, prediction_date):
+        return os.path.join(self.directory, f"{prediction_date.isoformat()}_{lottery_type}_{language_code}.txt")
+
+    def get(self, lottery_type, language_code, prediction_date):
+        try:
+            with open(self._path(lottery_type, language_code, prediction_date), 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, lottery_type, language_code, prediction_date, prediction):
+        path = self._path(lottery_type, language_code, prediction_date)
+        # Write to a temporary file and rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(prediction)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def create_prediction_store(backend=None):
+    """
+    Create the prediction store configured by the PREDICTION_STORE environment variable.
+
+    Args:
+        backend (str): 'memory', 'db' or 'file' (defaults to PREDICTION_STORE or 'memory')
+
+    Returns:
+        PredictionStore: The configured store
+    """
+    backend = (backend or os.environ.get("PREDICTION_STORE", "memory")).lower()
+    if backend == 'db':
+        store = DatabasePredictionStore()
+    elif backend == 'file':
+        directory = os.environ.get("PREDICTION_STORE_DIR", "prediction_cache")
+        store = FilePredictionStore(directory)
+    else:
+        if backend != 'memory':
+            logger.warning(f"Unknown prediction store backend: {backend}, using memory")
+        store = MemoryPredictionStore()
+
+    logger.info(f"Using {store.__class__.__name__} for daily predictions")
+    return store
@@ -0,0 +1,164 @@
+import os
+import glob
+import json
+import string
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompts')
+
+
+def compile_template(text, allowed_fields):
+    """
+    Parse a str.format style template once into (literal text, field name or None) pieces.
+
+    Args:
+        text (str): The template
+        allowed_fields (set): Field names the template may use
+
+    Returns:
+        list: The template pieces
+    """
+    pieces = [(literal, field) for literal, field, _, _ in string.Formatter().parse(text)]
+    unknown = {field for _, field in pieces if field is not None} - allowed_fields
+    if unknown:
+        raise ValueError(f"Unknown template fields {sorted(unknown)}")
+    return pieces
+
+
+def render_template(pieces, values):
+    """Fill a compiled template with values."""
+    return ''.join(literal + (values[field] if field is not None else '') for literal, field in pieces)
+
+
+class PromptRegistry:
+    """
+    Prediction prompts and message templates of every lottery type, loaded once from JSON files.
+
+    Each file in the prompts directory defines one lottery type (named after
+    the file) with its display name, model settings and, per language, the
+    system and user prompts, the header and footer wrapped around the generated
+    text and the error message. All templates are compiled when the registry is
+    loaded; rendered prompts are memoized per date, so a generation only
+    formats its prompts the first time they are used on a day.
+    """
+
+    # Fields of every language and the template placeholders they may use
+    FIELDS = {
+        'system': {'date'},
+        'user': {'date'},
+        'header': {'date'},
+        'footer': {'date'},
+        'error': {'date', 'error'}
+    }
+
+    # Rendered prompts kept before the memo is cleared (a few days of all types and languages)
+    MAX_RENDERED = 256
+
+    def __init__(self, prompts_dir=DEFAULT_PROMPTS_DIR):
+        """
+        Load and compile the prompt files.
+
+        Args:
+            prompts_dir (str): Directory with one <lottery type>.json file per lottery type
+        """
+        self.prompts_dir = prompts_dir
+        self._types = {}
+        for path in sorted(glob.glob(os.path.join(prompts_dir, '*.json'))):
+            prediction_type = os.path.splitext(os.path.basename(path))[0]
+            with open(path, encoding='utf-8') as f:
+                config = json.load(f)
+            try:
+                self._types[prediction_type] = self._compile(config)
+            except (KeyError, ValueError) as e:
+                raise ValueError(f"Invalid prompt file {path}: {e}") from e
+
+        self._rendered = {}
+        self._lock = threading.Lock()
+        logger.info(f"Loaded prompts for lottery types: {', '.join(self.types())}")
+
+    def _compile(self, config):
+        """Compile the templates of one lottery type."""
+        return {
+            'name': config['name'],
+            'model': config.get('model', 'gpt-4o-mini'),
+            'max_tokens': int(config.get('max_tokens', 1000)),
+            'order': config.get('order', 100),
+            'templates': {
+                language_code: {
+                    field: compile_template(templates[field], allowed_fields)
+                    for field, allowed_fields in self.FIELDS.items()
+                }
+                for language_code, templates in config['languages'].items()
+            }
+        }
+
+    def types(self):
+        """
+        Get the configured lottery types.
+
+        Returns:
+            list: Lottery type names in display order
+        """
+        return sorted(self._types, key=lambda prediction_type: (self._types[prediction_type]['order'], prediction_type))
+
+    def has_type(self, prediction_type):
+        """Check whether a lottery type is configured."""
+        return prediction_type in self._types
+
+    def settings(self, prediction_type):
+        """
+        Get the display name and model settings of a lottery type.
+
+        Returns:
+            dict: {'name', 'model', 'max_tokens'}
+        """
+        config = self._types[prediction_type]
+        return {'name': config['name'], 'model': config['model'], 'max_tokens': config['max_tokens']}
+
+    def languages(self, prediction_type):
+        """Get the language codes a lottery type has prompts for."""
+        return list(self._types[prediction_type]['templates'])
+
+    def render(self, prediction_type, language_code, date_text):
+        """
+        Get the prompts of a lottery type and language for a date.
+
+        Args:
+            prediction_type (str): The lottery type
+            language_code (str): The language code
+            date_text (str): The prediction date as shown to users (DD/MM/YYYY)
+
+        Returns:
+            dict: {'system', 'user', 'header', 'footer'}; treat as read-only, it is shared
+        """
+        key = (prediction_type, language_code, date_text)
+        rendered = self._rendered.get(key)
+        if rendered is None:
+            templates = self._types[prediction_type]['templates'][language_code]
+            values = {'date': date_text}
+            rendered = {field: render_template(templates[field], values)
+                        for field in ('system', 'user', 'header', 'footer')}
+            with self._lock:
+                if len(self._rendered) >= self.MAX_RENDERED:
+                    self._rendered.clear()
+                self._rendered[key] = rendered
+        return rendered
+
+    def error_message(self, prediction_type, language_code, date_text, error):
+        """
+        Render the error message of a lottery type.
+
+        Args:
+            prediction_type (str): The lottery type
+            language_code (str): The language code
+            date_text (str): The prediction date (DD/MM/YYYY)
+            error (str): Description of the error
+
+        Returns:
+            str: The error message
+        """
+        templates = self._types[prediction_type]['templates'][language_code]
+        return render_template(templates['error'], {'date': date_text, 'error': error})
@@ -0,0 +1,172 @@
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Per-phase startup timings of the app in milliseconds, reported at /metrics
+startup_timings = {}
+_phase_started = time.monotonic()
+
+
+def mark_startup_phase(name):
+    """Record how long the startup phase that just finished took."""
+    global _phase_started
+    now = time.monotonic()
+    startup_timings[name] = round((now - _phase_started) * 1000, 2)
+    _phase_started = now
+
+
+class ServiceRegistry:
+    """
+    Process-wide registry that builds each service lazily, exactly once.
+
+    Services are registered as factories and only constructed (and their
+    modules imported) the first time something asks for them, so worker
+    startup doesn't pay for services a request never uses. Each service has
+    its own build lock, so a slow build only holds up callers of that service.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._build_times = {}
+        self._build_locks = {}
+        self._lock = threading.Lock()
+        # Build time of the services built by the enclosing build, per thread
+        self._nested = threading.local()
+
+    def register(self, name, factory):
+        """
+        Register a factory for a service.
+
+        Args:
+            name (str): The service name
+            factory (callable): Function without arguments that builds the service
+        """
+        self._factories[name] = factory
+
+    def get(self, name):
+        """
+        Get a service, building it on first use.
+
+        Args:
+            name (str): The service name
+
+        Returns:
+            The shared service instance
+        """
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+
+        with build_lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                instance = self._build(name)
+        return instance
+
+    def _build(self, name):
+        """Build a service, recording its build time without the services it built in turn."""
+        outer_nested_ms = getattr(self._nested, 'ms', 0.0)
+        self._nested.ms = 0.0
+        started = time.monotonic()
+        try:
+            instance = self._factories[name]()
+        finally:
+            elapsed_ms = (time.monotonic() - started) * 1000
+            own_ms = elapsed_ms - self._nested.ms
+            self._nested.ms = outer_nested_ms + elapsed_ms
+
+        self._instances[name] = instance
+        self._build_times[name] = round(own_ms, 2)
+        logger.info(f"Built service {name} in {own_ms:.1f}ms ({elapsed_ms:.1f}ms with its dependencies)")
+        return instance
+
+    def get_if_built(self, name):
+        """Get a service only if it was already built, otherwise None."""
+        return self._instances.get(name)
+
+    def get_timings(self):
+        """
+        Get how long each built service took to construct (including imports, excluding
+        the services it built in turn, so the timings add up).
+
+        Returns:
+            dict: {service_name: milliseconds}
+        """
+        return dict(self._build_times)
+
+
+registry = ServiceRegistry()
+
+
+def _build_language_service():
+    from language_service import LanguageService
+    return LanguageService()
+
+
+def _build_llm_gateway():
+    from llm_gateway import create_llm_gateway
+    return create_llm_gateway()
+
+
+def _build_prediction_service():
+    from prediction_service import PredictionService
+    return PredictionService(language_service=registry.get('language_service'), llm=registry.get('llm_gateway'))
+
+
+def _build_slot_game_service():
+    from slot_game_service import SlotGameService
+    return SlotGameService(language_service=registry.get('language_service'), llm=registry.get('llm_gateway'))
+
+
+def _build_catalog_refresher():
+    return registry.get('slot_game_service').refresher
+
+
+def _build_telegram_client():
+    from telegram_client import TelegramClient
+    token = os.environ.get("TELEGRAM_BOT_TOKEN")
+    if not token:
+        raise ValueError("TELEGRAM_BOT_TOKEN environment variable is not set")
+    return TelegramClient(
+        token,
+        timeout=float(os.environ.get("TELEGRAM_TIMEOUT", 10)),
+        max_retries=int(os.environ.get("TELEGRAM_MAX_RETRIES", 3)),
+        pool_size=int(os.environ.get("TELEGRAM_POOL_SIZE", 20))
+    )
+
+
+def _build_outbound_scheduler():
+    from outbound_scheduler import create_outbound_scheduler
+    return create_outbound_scheduler(registry.get('telegram_client'))
+
+
+def _build_broadcast_service():
+    from broadcast_service import BroadcastService
+    return BroadcastService(
+        registry.get('prediction_service'),
+        registry.get('language_service'),
+        registry.get('outbound_scheduler')
+    )
+
+
+def _build_bot_handler():
+    from bot_handler import TelegramBotHandler
+    return TelegramBotHandler()
+
+
+registry.register('language_service', _build_language_service)
+registry.register('llm_gateway', _build_llm_gateway)
+registry.register('prediction_service', _build_prediction_service)
+registry.register('slot_game_service', _build_slot_game_service)
+registry.register('catalog_refresher', _build_catalog_refresher)
+registry.register('telegram_client', _build_telegram_client)
+registry.register('outbound_scheduler', _build_outbound_scheduler)
+registry.register('broadcast_service', _build_broadcast_service)
+registry.register('bot_handler', _build_bot_handler)
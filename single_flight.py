@@ -0,0 +1,144 @@
+import os
+import re
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """An in-flight call that other threads can wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key so only one of them does the work.
+
+    Within a process, concurrent callers for a key wait on the leader's result.
+    Across processes (e.g. gunicorn workers), leaders additionally serialize on a
+    file lock in a shared local directory, so the work function should re-check
+    any shared cache before doing expensive work.
+    """
+
+    def __init__(self, lock_dir=None):
+        """
+        Initialize the single-flight group.
+
+        Args:
+            lock_dir (str): Directory for cross-process lock files, or None to
+                            only coalesce within this process
+        """
+        self.lock_dir = lock_dir
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        if self.lock_dir and fcntl:
+            os.makedirs(self.lock_dir, exist_ok=True)
+        elif self.lock_dir:
+            logger.warning("fcntl is not available, single-flight will only coalesce within this process")
+            self.lock_dir = None
+
+    def do(self, key, fn):
+        """
+        Run fn for the key, or wait for the call already in flight for it.
+
+        Args:
+            key (str): Identifies the work being done
+            fn (callable): Function producing the result
+
+        Returns:
+            The result of fn (shared between all coalesced callers)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call:
+                call.waiters += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            logger.info(f"Waiting for in-flight call for {key}")
+            call.event.wait()
+            if call.error:
+                raise call.error
+            return call.result
+
+        try:
+            with self._process_lock(key):
+                call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                logger.info(f"Shared result for {key} with {call.waiters} waiting callers")
+            call.event.set()
+
+        return call.result
+
+    @contextmanager
+    def _process_lock(self, key):
+        """Hold an exclusive file lock for the key across processes."""
+        if not self.lock_dir:
+            yield
+            return
+
+        safe_key = re.sub(r'[^A-Za-z0-9_.-]+', '_', key)
+        lock_path = os.path.join(self.lock_dir, f"{safe_key}.lock")
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def default_lock_dir():
+    """Get the shared lock directory used by all workers on this host."""
+    return os.environ.get("SINGLE_FLIGHT_LOCK_DIR") or os.path.join(tempfile.gettempdir(), "nova88_locks")
+
+
+def acquire_leader_lock(name, lock_dir=None):
+    """
+    Block until this process is the only one on the host holding the named lock.
+
+    Used to run a background job in just one gunicorn worker: every worker
+    calls this from the job's thread and the one that gets the lock runs the
+    job. The lock is held until the returned file is closed or the process
+    exits, after which a waiting worker takes over.
+
+    Args:
+        name (str): Name of the lock
+        lock_dir (str): Directory of the lock file (defaults to the single-flight lock directory)
+
+    Returns:
+        file: The open lock file (keep a reference to hold the lock), or None if
+              fcntl is not available and the lock can't be held
+    """
+    if not fcntl:
+        logger.warning(f"fcntl is not available, {name} runs in every process")
+        return None
+
+    lock_dir = lock_dir or default_lock_dir()
+    os.makedirs(lock_dir, exist_ok=True)
+    lock_file = open(os.path.join(lock_dir, f"{name}.lock"), 'a')
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    return lock_file
@@ -1,29 +1,32 @@
 import os
+import html
 import logging
 import re
-from openai import OpenAI
 from pgsoft_scraper import PGSoftScraper
-from models import PGSoftGame
 from app import db
 from language_service import LanguageService
+from llm_gateway import LLMError, create_llm_gateway
+from game_info_cache import create_game_info_cache
+from game_catalog import GameCatalog, lookup_game
+from catalog_refresher import create_catalog_refresher
+from game_name_index import build_game_name_index
 
 logger = logging.getLogger(__name__)
 
 class SlotGameService:
-    def __init__(self):
-        """Initialize the slot game service with OpenAI client and PGSoft scraper."""
-        # Initialize OpenAI client
-        self.openai_api_key = os.environ.get("OPENAI_API_KEY")
-        if not self.openai_api_key:
-            raise ValueError("OPENAI_API_KEY environment variable is not set")
+    def __init__(self, language_service=None, llm=None):
+        """Initialize the slot game service with the shared LLM gateway and PGSoft scraper."""
+        # OpenAI calls go through the gateway (deadlines, retries, circuit breaker)
+        self.llm = llm or create_llm_gateway()
         
-        self.openai = OpenAI(api_key=self.openai_api_key)
+        # Generated game texts are cached until the scraped game data changes
+        self.game_info_cache = create_game_info_cache()
         
         # Initialize PGSoft scraper
-        self.scraper = PGSoftScraper()
+        self.scraper = PGSoftScraper(game_info_cache=self.game_info_cache)
         
-        # Initialize language service
-        self.language_service = LanguageService()
+        # Use the shared language service if one is provided
+        self.language_service = language_service or LanguageService()
         
         # Popular PGSoft slot games
         self.popular_games = [
@@ -73,9 +76,55 @@ class SlotGameService:
             "jungle delight": "pg-soft-jungle-delight"
         }
         
+        # Snapshot of the popular games' cached data for /ds_slot
+        self.catalog = GameCatalog(
+            [self.game_id_mapping[game.lower()] for game in self.popular_games if game.lower() in self.game_id_mapping],
+            ttl=float(os.environ.get("GAME_CATALOG_TTL", 300))
+        )
+        
+        # Resolves typed (and mistyped) game names to game IDs
+        self.name_index = build_game_name_index(self.game_id_mapping)
+        
+        # Refreshes stored game data in the background before it expires
+        self.refresher = create_catalog_refresher(self.scraper, on_refresh=self._on_catalog_refresh)
+        
         logger.info("Slot game service initialized")
 
-    def get_game_info(self, game_name, language_code='vi'):
+    def _on_catalog_refresh(self):
+        """Pick up refreshed games in the popular list snapshot and the name index."""
+        self.catalog.invalidate()
+        self.name_index.invalidate()
+
+    def _complete(self, messages, progress=None, progress_prefix=''):
+        """
+        Get a chat completion from GPT-4o Mini, streaming it to a progress listener if one is given.
+        
+        Args:
+            messages (list): The chat messages
+            progress (StreamingMessage): Gets start() before the request and update(text) as text arrives
+            progress_prefix (str): Text shown before the generated text in progress updates
+            
+        Returns:
+            str: The generated text
+            
+        Raises:
+            LLMError: If the gateway could not produce a completion
+        """
+        on_text = None
+        if progress:
+            progress.start()
+            on_text = lambda text: progress.update(f"{progress_prefix}\n\n{text}")
+        
+        # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
+        # do not change this unless explicitly requested by the user
+        return self.llm.complete(
+            messages,
+            model="gpt-4o-mini",  # Using GPT-4o Mini as specified in requirements
+            max_tokens=500,
+            on_text=on_text
+        )
+
+    def get_game_info(self, game_name, language_code='vi', progress=None):
         """
         Get detailed information about a PGSoft slot game using real data from
         the official website combined with GPT-4o Mini analysis.
@@ -83,6 +132,8 @@ class SlotGameService:
         Args:
             game_name (str): The name of the PGSoft slot game
             language_code (str): The language code to generate the information in
+            progress (StreamingMessage): Shows the information while it is generated
+                                         (not used when it is cached)
             
         Returns:
             str: Detailed information about the game in the requested language with image URL
@@ -91,31 +142,37 @@ class SlotGameService:
             # Convert game name to standardized format for lookup
             game_name_lower = game_name.lower().strip()
             
-            # Find the game ID by using our mapping or constructing it
-            game_id = None
-            if game_name_lower in self.game_id_mapping:
-                game_id = self.game_id_mapping[game_name_lower]
-            else:
+            # Find the game ID in the name index (tolerates typos) or construct it
+            game_id = self.name_index.resolve(game_name)
+            if not game_id:
                 # Try to construct a likely game ID format
                 game_id = f"pg-soft-{re.sub(r'[^a-z0-9]+', '-', game_name_lower)}"
             
             # Fetch game details from our scraper or database
             game_data = None
             
-            # Check database first
-            cached_game = PGSoftGame.query.filter_by(game_id=game_id).first()
-            if cached_game and PGSoftGame.is_cache_valid(game_id):
+            # Check database first, stored data is served even when old and refreshed in the background
+            lookup = lookup_game(game_id)
+            if lookup['game']:
                 logger.info(f"Using cached game data for: {game_name}")
-                game_data = cached_game.to_dict()
+                game_data = lookup['game']
+                if self.refresher.is_stale(lookup['last_updated']):
+                    self.refresher.request_refresh(game_id)
             else:
-                # Fetch fresh data if no cache or cache is expired
+                # Only games we have never seen are fetched while the user waits
                 logger.info(f"Fetching fresh game data for: {game_name}")
+                if progress:
+                    # Scraping takes a while too, show the placeholder right away
+                    progress.start()
                 game_data = self.scraper.fetch_game_details(game_id)
+                self.catalog.invalidate()
+                if game_data and game_data.get('description'):
+                    self.name_index.add_game(game_id, game_data.get('name', game_name))
                 
             # If we couldn't find the game, try a more generic approach
             if not game_data:
                 logger.warning(f"Could not find game data for {game_name}, using generic info")
-                return self._generate_generic_game_info(game_name, language_code)
+                return self._generate_generic_game_info(game_name, language_code, progress, game_id=game_id)
                 
             # Extract game details
             name = game_data.get('name', game_name)
@@ -255,18 +312,26 @@ class SlotGameService:
                 
             template = templates[language_code]
             
-            # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-            # do not change this unless explicitly requested by the user
-            response = self.openai.chat.completions.create(
-                model="gpt-4o-mini",  # Using GPT-4o Mini as specified in requirements
-                messages=[
-                    {"role": "system", "content": template['system_content']},
-                    {"role": "user", "content": template['prompt_template']}
-                ],
-                max_tokens=500
-            )
-            
-            game_info = response.choices[0].message.content
+            # Reuse the text generated earlier from the same game data
+            cache_game_id = game_data.get('game_id') or game_id
+            source_hash = self.game_info_cache.source_hash(game_data)
+            cached_info = self.game_info_cache.get(cache_game_id, language_code, source_hash)
+            if cached_info:
+                logger.info(f"Using cached slot game info for: {game_name}")
+                return cached_info
+            
+            try:
+                game_info = self._complete(
+                    [
+                        {"role": "system", "content": template['system_content']},
+                        {"role": "user", "content": template['prompt_template']}
+                    ],
+                    progress=progress,
+                    progress_prefix=template['header']
+                )
+            except LLMError as e:
+                logger.error(f"Error generating slot game info for {game_name}: {e}")
+                return self._fallback_game_info(cache_game_id, language_code, template, description or '', image_url)
             
             # Format the response with a header and the actual image URL
             formatted_info = f"""
@@ -282,15 +347,53 @@ class SlotGameService:
 """
             
             logger.info(f"Generated slot game info with real data for: {game_name}")
+            self.game_info_cache.set(cache_game_id, language_code, source_hash, formatted_info, image_url)
             
             # Return both the formatted info text and image URL so the bot handler can use it
             return {"text": formatted_info, "image_url": image_url}
             
         except Exception as e:
             logger.error(f"Error generating slot game info: {e}")
-            return {"text": f"❌ Đã xảy ra lỗi khi tìm thông tin về game '{game_name}'. Vui lòng thử lại sau. Error: {str(e)}", "image_url": None}
+            return {"text": f"❌ Đã xảy ra lỗi khi tìm thông tin về game '{game_name}'. Vui lòng thử lại sau.", "image_url": None}
 
-    def _generate_generic_game_info(self, game_name, language_code='vi'):
+    def _fallback_game_info(self, game_id, language_code, template, description, image_url):
+        """
+        Get game info without the LLM: the last generated text, even if stale, or else the scraped description.
+        
+        Neither is cached, so the text is generated again once the LLM is reachable.
+        
+        Args:
+            game_id (str): The PGSoft game ID
+            language_code (str): The language code
+            template (dict): The language's template (header, rtp_label, footer, play_button)
+            description (str): The scraped game description, or None if there is none
+            image_url (str): The image URL to send with the text
+            
+        Returns:
+            dict: {"text": ..., "image_url": ...}, or None if there is neither
+        """
+        latest = self.game_info_cache.get_latest(game_id, language_code) if game_id else None
+        if latest:
+            logger.info(f"Serving the last generated game info of {game_id} while the LLM is unavailable")
+            return {"text": latest['text'], "image_url": latest['image_url'] or image_url}
+        if description is None:
+            return None
+        
+        logger.info(f"Serving the scraped description of {game_id} while the LLM is unavailable")
+        formatted_info = f"""
+{template['header']}
+
+{html.escape(description[:1500].strip())}
+
+{template['rtp_label']}
+
+{template['footer']}
+
+{template['play_button']}
+"""
+        return {"text": formatted_info, "image_url": image_url}
+
+    def _generate_generic_game_info(self, game_name, language_code='vi', progress=None, game_id=None):
         """Generate generic game info when specific data cannot be found."""
         try:
             # Try to find a fallback image based on game name
@@ -389,18 +492,21 @@ class SlotGameService:
                 
             template = templates[language_code]
             
-            # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-            # do not change this unless explicitly requested by the user
-            response = self.openai.chat.completions.create(
-                model="gpt-4o-mini",  # Using GPT-4o Mini as specified in requirements
-                messages=[
-                    {"role": "system", "content": template['system_content']},
-                    {"role": "user", "content": template['prompt_template']}
-                ],
-                max_tokens=500
-            )
-            
-            game_info = response.choices[0].message.content
+            try:
+                game_info = self._complete(
+                    [
+                        {"role": "system", "content": template['system_content']},
+                        {"role": "user", "content": template['prompt_template']}
+                    ],
+                    progress=progress,
+                    progress_prefix=template['header']
+                )
+            except LLMError as e:
+                logger.error(f"Error generating generic slot game info for {game_name}: {e}")
+                fallback = self._fallback_game_info(game_id, language_code, template, None, fallback_image_url)
+                if fallback:
+                    return fallback
+                raise
             
             # Format the response with a header
             formatted_info = f"""
@@ -431,82 +537,28 @@ class SlotGameService:
             dict: Contains formatted text list and a list of game data
         """
         try:
-            # Try to fetch real game data from scraper
-            games_data = []
-            for game_name in self.popular_games:
-                game_name_lower = game_name.lower()
-                if game_name_lower in self.game_id_mapping:
-                    game_id = self.game_id_mapping[game_name_lower]
-                    
-                    # Check if we have cached data
-                    cached_game = PGSoftGame.query.filter_by(game_id=game_id).first()
-                    if cached_game:
-                        games_data.append(cached_game.to_dict())
+            # Cached game data for all popular games, loaded with a single query
+            games_data = list(self.catalog.get_games())
+            
+            # With enough cached games the rendered list only changes with the catalog
+            if len(games_data) >= 5:
+                return self.catalog.get_rendered(
+                    language_code, lambda games: self._render_popular_games_list(games, language_code))
             
             # If we don't have enough games from cache, fetch some from the website
-            if len(games_data) < 5:
-                try:
-                    fetched_games = self.scraper.fetch_game_list()
-                    if fetched_games:
-                        for game in fetched_games[:20]:  # Limit to 20 games
-                            games_data.append(game)
-                except Exception as e:
-                    logger.error(f"Error fetching game list: {e}")
+            try:
+                fetched_games = self.scraper.fetch_game_list()
+                if fetched_games:
+                    for game in fetched_games[:20]:  # Limit to 20 games
+                        games_data.append(game)
+            except Exception as e:
+                logger.error(f"Error fetching game list: {e}")
             
             # Make sure we have at least the popular games list even if scraping failed
             if not games_data:
                 games_data = [{"name": game} for game in self.popular_games]
             
-            # Define language-specific templates
-            templates = {
-                'vi': {
-                    'header': "<b>🎯 DANH SÁCH CÁC GAME SLOT PGSOFT PHỔ BIẾN 🎯</b>",
-                    'usage_info': "<i>Sử dụng lệnh /slotgame tên_game để xem thông tin chi tiết về một game cụ thể.</i>",
-                    'example': "<i>Ví dụ: /slotgame Mahjong Ways 2</i>",
-                    'play_button': "<a href=\"https://nova88bet.top/\">💎 Chơi ngay tại NOVA88BET 💎</a>"
-                },
-                'en': {
-                    'header': "<b>🎯 LIST OF POPULAR PGSOFT SLOT GAMES 🎯</b>",
-                    'usage_info': "<i>Use the /slotgame game_name command to view detailed information about a specific game.</i>",
-                    'example': "<i>Example: /slotgame Mahjong Ways 2</i>",
-                    'play_button': "<a href=\"https://nova88bet.top/\">💎 Play now at NOVA88BET 💎</a>"
-                },
-                'th': {
-                    'header': "<b>🎯 รายชื่อเกมสล็อต PGSOFT ยอดนิยม 🎯</b>",
-                    'usage_info': "<i>ใช้คำสั่ง /slotgame ชื่อเกม เพื่อดูข้อมูลโดยละเอียดเกี่ยวกับเกมเฉพาะ</i>",
-                    'example': "<i>ตัวอย่าง: /slotgame Mahjong Ways 2</i>",
-                    'play_button': "<a href=\"https://nova88bet.top/\">💎 เล่นเลยที่ NOVA88BET 💎</a>"
-                },
-                'zh': {
-                    'header': "<b>🎯 热门PGSOFT老虎机游戏列表 🎯</b>",
-                    'usage_info': "<i>使用 /slotgame 游戏名称 命令查看特定游戏的详细信息。</i>",
-                    'example': "<i>示例：/slotgame Mahjong Ways 2</i>",
-                    'play_button': "<a href=\"https://nova88bet.top/\">💎 立即在NOVA88BET上玩 💎</a>"
-                }
-            }
-            
-            # Select the appropriate language template or default to Vietnamese
-            if language_code not in templates:
-                logger.warning(f"Language code '{language_code}' not supported for game list, using Vietnamese")
-                language_code = 'vi'
-                
-            template = templates[language_code]
-            
-            # Create a formatted list string
-            game_list = "\n".join([f"🎮 {i+1}. {game.get('name')}" for i, game in enumerate(games_data[:20])])
-            
-            formatted_list = f"""
-{template['header']}
-
-{game_list}
-
-{template['usage_info']}
-{template['example']}
-
-{template['play_button']}
-"""
-            logger.info(f"Generated popular games list in {language_code}")
-            return {"text": formatted_list, "games": games_data}
+            return self._render_popular_games_list(games_data, language_code)
             
         except Exception as e:
             logger.error(f"Error generating game list: {e}")
@@ -559,4 +611,57 @@ class SlotGameService:
 {error_template['play_button']}
 """
             logger.info(f"Generated fallback popular games list in {language_code}")
-            return {"text": formatted_list, "games": []}
\ No newline at end of file
+            return {"text": formatted_list, "games": []}
+
+    def _render_popular_games_list(self, games_data, language_code):
+        """Format the popular games list message in the given language."""
+        # Define language-specific templates
+        templates = {
+            'vi': {
+                'header': "<b>🎯 DANH SÁCH CÁC GAME SLOT PGSOFT PHỔ BIẾN 🎯</b>",
+                'usage_info': "<i>Sử dụng lệnh /slotgame tên_game để xem thông tin chi tiết về một game cụ thể.</i>",
+                'example': "<i>Ví dụ: /slotgame Mahjong Ways 2</i>",
+                'play_button': "<a href=\"https://nova88bet.top/\">💎 Chơi ngay tại NOVA88BET 💎</a>"
+            },
+            'en': {
+                'header': "<b>🎯 LIST OF POPULAR PGSOFT SLOT GAMES 🎯</b>",
+                'usage_info': "<i>Use the /slotgame game_name command to view detailed information about a specific game.</i>",
+                'example': "<i>Example: /slotgame Mahjong Ways 2</i>",
+                'play_button': "<a href=\"https://nova88bet.top/\">💎 Play now at NOVA88BET 💎</a>"
+            },
+            'th': {
+                'header': "<b>🎯 รายชื่อเกมสล็อต PGSOFT ยอดนิยม 🎯</b>",
+                'usage_info': "<i>ใช้คำสั่ง /slotgame ชื่อเกม เพื่อดูข้อมูลโดยละเอียดเกี่ยวกับเกมเฉพาะ</i>",
+                'example': "<i>ตัวอย่าง: /slotgame Mahjong Ways 2</i>",
+                'play_button': "<a href=\"https://nova88bet.top/\">💎 เล่นเลยที่ NOVA88BET 💎</a>"
+            },
+            'zh': {
+                'header': "<b>🎯 热门PGSOFT老虎机游戏列表 🎯</b>",
+                'usage_info': "<i>使用 /slotgame 游戏名称 命令查看特定游戏的详细信息。</i>",
+                'example': "<i>示例：/slotgame Mahjong Ways 2</i>",
+                'play_button': "<a href=\"https://nova88bet.top/\">💎 立即在NOVA88BET上玩 💎</a>"
+            }
+        }
+        
+        # Select the appropriate language template or default to Vietnamese
+        if language_code not in templates:
+            logger.warning(f"Language code '{language_code}' not supported for game list, using Vietnamese")
+            language_code = 'vi'
+            
+        template = templates[language_code]
+        
+        # Create a formatted list string
+        game_list = "\n".join([f"🎮 {i+1}. {game.get('name')}" for i, game in enumerate(games_data[:20])])
+        
+        formatted_list = f"""
+{template['header']}
+
+{game_list}
+
+{template['usage_info']}
+{template['example']}
+
+{template['play_button']}
+"""
+        logger.info(f"Generated popular games list in {language_code}")
+        return {"text": formatted_list, "games": games_data}
@@ -0,0 +1,119 @@
+import re
+import time
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingMessage:
+    """
+    A Telegram message that shows an LLM answer while it is being generated.
+
+    start() sends a placeholder, update() edits it with the text generated so
+    far (at most every min_interval seconds unless min_chars new characters
+    arrived) and finish() replaces it with the final text. Partial texts are
+    sent as plain text with the HTML tags stripped, since a half-generated
+    answer may contain unbalanced markup; only the final text uses HTML.
+    """
+
+    # Telegram's limit for message texts
+    MAX_LENGTH = 4096
+
+    def __init__(self, telegram, chat_id, placeholder, min_interval=0.7, min_chars=200):
+        """
+        Initialize the streaming message.
+
+        Args:
+            telegram (TelegramClient): Client used for the Bot API calls
+            chat_id (int): The chat to answer in
+            placeholder (str): Text shown until the first content arrives
+            min_interval (float): Minimum seconds between two edits
+            min_chars (int): New characters that trigger an edit before min_interval passed
+        """
+        self.telegram = telegram
+        self.chat_id = chat_id
+        self.placeholder = placeholder
+        self.min_interval = min_interval
+        self.min_chars = min_chars
+        self.message_id = None
+        self.edits = 0
+        self._shown = ''
+        self._last_edit = 0.0
+        self._started = None
+        self._first_content_ms = None
+
+    @property
+    def started(self):
+        """Whether the placeholder was sent, i.e. the reply has to be finished with finish()."""
+        return self.message_id is not None
+
+    def start(self):
+        """Send the placeholder message (called by the service right before it starts generating)."""
+        if self.started:
+            return
+        self._started = time.monotonic()
+        response_json = self.telegram.call("sendMessage", {"chat_id": self.chat_id, "text": self.placeholder})
+        if response_json.get('ok'):
+            self.message_id = response_json['result']['message_id']
+            self._last_edit = time.monotonic()
+        else:
+            logger.error(f"Failed to send streaming placeholder: {response_json}")
+
+    def update(self, text):
+        """
+        Show the text generated so far, if the last edit was long enough ago.
+
+        Args:
+            text (str): The full text generated so far
+        """
+        if not self.started:
+            return
+        text = re.sub(r'<[^>]+>', '', text).strip()[:self.MAX_LENGTH]
+        if not text or text == self._shown:
+            return
+        if (time.monotonic() - self._last_edit < self.min_interval
+                and len(text) - len(self._shown) < self.min_chars):
+            return
+
+        # Partial edits are best effort, the next one supersedes a failed one
+        if self._edit({"text": text}, max_retries=0):
+            if self._first_content_ms is None:
+                self._first_content_ms = (time.monotonic() - self._started) * 1000
+            self._shown = text
+
+    def finish(self, text, reply_markup=None):
+        """
+        Replace the message with the final text.
+
+        Args:
+            text (str): The final HTML text
+            reply_markup (dict): Inline keyboard to attach
+
+        Returns:
+            bool: True if the message was updated, False if the caller should send the text instead
+        """
+        if not self.started:
+            return False
+        data = {"text": text, "parse_mode": "HTML"}
+        if reply_markup:
+            data["reply_markup"] = json.dumps(reply_markup)
+        ok = self._edit(data, max_retries=None)
+        logger.info(f"Streamed reply in {self.edits} edits, first content after "
+                    f"{self._first_content_ms or 0:.0f}ms, done after {(time.monotonic() - self._started) * 1000:.0f}ms")
+        return ok
+
+    def _edit(self, data, max_retries):
+        """Edit the message, returning True on success."""
+        self._last_edit = time.monotonic()
+        response_json = self.telegram.call(
+            "editMessageText", {"chat_id": self.chat_id, "message_id": self.message_id, **data},
+            max_retries=max_retries)
+        self.edits += 1
+        if not response_json.get('ok'):
+            # Telegram rejects edits that don't change the text, which is harmless
+            if 'message is not modified' in str(response_json.get('description', '')):
+                return True
+            logger.warning(f"Failed to edit streaming message: {response_json}")
+            return False
+        return True
@@ -0,0 +1,170 @@
+import time
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramClient:
+    """Client for the Telegram Bot API with a pooled keep-alive session, timeouts and retries."""
+
+    # Upper bounds (in ms) of the latency histogram buckets
+    LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    # Methods that are safe to repeat after a read timeout; for others (sendMessage, sendPhoto, ...)
+    # Telegram has usually already performed the call, and repeating it would send it twice
+    IDEMPOTENT_PREFIXES = ('get', 'set', 'delete', 'edit')
+
+    def __init__(self, token, timeout=10, max_retries=3, pool_size=20, max_retry_after=30):
+        """
+        Initialize the Telegram client.
+
+        Args:
+            token (str): The Telegram bot token
+            timeout (float): Default per-call timeout in seconds
+            max_retries (int): Retries for rate-limited, failed or 5xx calls
+            pool_size (int): Maximum number of pooled connections to api.telegram.org
+            max_retry_after (float): Longest retry_after (in seconds) we are willing to wait for
+        """
+        self.api_url = f"https://api.telegram.org/bot{token}"
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+
+        # A single session keeps TLS connections alive between calls
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+
+        self._metrics = {}
+        self._metrics_lock = threading.Lock()
+
+        logger.info(f"Telegram client initialized with pool size {pool_size} and {timeout}s timeout")
+
+    def call(self, method, data=None, timeout=None, max_retries=None):
+        """
+        Call a Bot API method.
+
+        Args:
+            method (str): The Bot API method name (e.g. 'sendMessage')
+            data (dict): Form parameters for the method
+            timeout (float): Timeout in seconds for this call (defaults to the client timeout)
+            max_retries (int): Retries for this call (defaults to the client setting); failures
+                               after the request may have reached Telegram are only retried
+                               for idempotent methods
+
+        Returns:
+            dict: The decoded Telegram response, or {"ok": False, "error": ..., "retryable": ...} if no
+                  response could be read; retryable is False when Telegram may already have
+                  performed a non-idempotent call
+        """
+        url = f"{self.api_url}/{method}"
+        timeout = timeout or self.timeout
+        max_retries = self.max_retries if max_retries is None else max_retries
+        idempotent = self.is_idempotent(method)
+        attempt = 0
+
+        while True:
+            started = time.monotonic()
+            response = None
+            try:
+                response = self.session.post(url, data=data, timeout=timeout)
+                response_json = response.json()
+            except (requests.RequestException, ValueError) as e:
+                self._record(method, started, ok=False)
+                # Connection failures mean the request never got through; a read timeout or an
+                # unreadable response may follow a call Telegram already performed
+                unsent = isinstance(e, (requests.ConnectionError, requests.ConnectTimeout))
+                server_error = response is not None and response.status_code >= 500
+                retryable = unsent or server_error or idempotent
+                if attempt < max_retries and retryable:
+                    attempt += 1
+                    delay = 0.5 * 2 ** (attempt - 1)
+                    logger.warning(f"Telegram {method} failed ({e}), retrying in {delay}s")
+                    time.sleep(delay)
+                    continue
+                logger.error(f"Telegram {method} failed after {attempt + 1} attempts: {e}")
+                failure = {"ok": False, "error": str(e), "retryable": retryable}
+                if response is not None:
+                    failure["error_code"] = response.status_code
+                return failure
+
+            ok = response_json.get('ok', False)
+            self._record(method, started, ok=ok)
+            if ok or attempt >= max_retries:
+                return response_json
+
+            if response.status_code == 429:
+                # Telegram tells us how long to back off for
+                retry_after = response_json.get('parameters', {}).get('retry_after', 1)
+                if retry_after > self.max_retry_after:
+                    logger.warning(f"Telegram {method} rate limited for {retry_after}s, not retrying")
+                    return response_json
+                attempt += 1
+                logger.warning(f"Telegram {method} rate limited, retrying in {retry_after}s")
+                time.sleep(retry_after)
+                continue
+
+            if response.status_code >= 500:
+                attempt += 1
+                delay = 0.5 * 2 ** (attempt - 1)
+                logger.warning(f"Telegram {method} returned {response.status_code}, retrying in {delay}s")
+                time.sleep(delay)
+                continue
+
+            # Client errors (bad request, blocked by user, ...) won't succeed on retry
+            return response_json
+
+    def is_idempotent(self, method):
+        """Check whether a method may be repeated when it is unknown whether Telegram performed it."""
+        return method.startswith(self.IDEMPOTENT_PREFIXES)
+
+    def _record(self, method, started, ok):
+        """Record the latency of one HTTP attempt in the method's histogram."""
+        elapsed_ms = (time.monotonic() - started) * 1000
+        with self._metrics_lock:
+            metrics = self._metrics.get(method)
+            if not metrics:
+                metrics = {
+                    'count': 0,
+                    'errors': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'buckets': [0] * (len(self.LATENCY_BUCKETS_MS) + 1)
+                }
+                self._metrics[method] = metrics
+
+            metrics['count'] += 1
+            metrics['total_ms'] += elapsed_ms
+            metrics['max_ms'] = max(metrics['max_ms'], elapsed_ms)
+            if not ok:
+                metrics['errors'] += 1
+
+            for i, bound in enumerate(self.LATENCY_BUCKETS_MS):
+                if elapsed_ms <= bound:
+                    metrics['buckets'][i] += 1
+                    break
+            else:
+                metrics['buckets'][-1] += 1
+
+    def get_metrics(self):
+        """
+        Get per-method call counts and latency histograms.
+
+        Returns:
+            dict: {method: {count, errors, avg_ms, max_ms, histogram}}
+        """
+        labels = [f"<={bound}ms" for bound in self.LATENCY_BUCKETS_MS] + [f">{self.LATENCY_BUCKETS_MS[-1]}ms"]
+        with self._metrics_lock:
+            return {
+                method: {
+                    'count': metrics['count'],
+                    'errors': metrics['errors'],
+                    'avg_ms': round(metrics['total_ms'] / metrics['count'], 2) if metrics['count'] else 0.0,
+                    'max_ms': round(metrics['max_ms'], 2),
+                    'histogram': dict(zip(labels, metrics['buckets']))
+                }
+                for method, metrics in self._metrics.items()
+            }
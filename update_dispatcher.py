@@ -0,0 +1,132 @@
+import queue
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateDispatcher:
+    """Bounded queue + worker pool that processes Telegram updates off the request thread."""
+
+    def __init__(self, handler, max_queue_size=1000, num_workers=4):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            handler (callable): Function called with each update dict
+            max_queue_size (int): Maximum number of updates waiting to be processed
+            num_workers (int): Number of worker threads draining the queue
+        """
+        self.handler = handler
+        self.max_queue_size = max_queue_size
+        self.num_workers = num_workers
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._workers = []
+        self._lock = threading.Lock()
+
+        # Backpressure metrics
+        self._stats = {
+            'enqueued': 0,
+            'rejected': 0,
+            'processed': 0,
+            'failed': 0,
+            'busy_workers': 0,
+            'max_queue_depth': 0,
+            'total_wait_ms': 0.0,
+            'max_wait_ms': 0.0,
+            'total_processing_ms': 0.0,
+        }
+
+        logger.info(f"Update dispatcher initialized with {num_workers} workers and queue depth {max_queue_size}")
+
+    def start(self):
+        """Start the worker threads (idempotent)."""
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.num_workers):
+                worker = threading.Thread(target=self._worker_loop, name=f"update-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+        logger.info(f"Started {self.num_workers} update workers")
+
+    def submit(self, update):
+        """
+        Enqueue an update for background processing.
+
+        Args:
+            update (dict): The Telegram update
+
+        Returns:
+            bool: True if the update was queued, False if the queue is full
+        """
+        try:
+            self._queue.put_nowait((time.monotonic(), update))
+        except queue.Full:
+            with self._lock:
+                self._stats['rejected'] += 1
+            logger.warning(f"Update queue is full ({self.max_queue_size}), rejecting update {update.get('update_id')}")
+            return False
+
+        with self._lock:
+            self._stats['enqueued'] += 1
+            depth = self._queue.qsize()
+            if depth > self._stats['max_queue_depth']:
+                self._stats['max_queue_depth'] = depth
+        return True
+
+    def _worker_loop(self):
+        """Drain the queue forever, processing one update at a time."""
+        while True:
+            enqueued_at, update = self._queue.get()
+            started = time.monotonic()
+            wait_ms = (started - enqueued_at) * 1000
+
+            with self._lock:
+                self._stats['busy_workers'] += 1
+                self._stats['total_wait_ms'] += wait_ms
+                if wait_ms > self._stats['max_wait_ms']:
+                    self._stats['max_wait_ms'] = wait_ms
+
+            failed = False
+            try:
+                self.handler(update)
+            except Exception as e:
+                failed = True
+                logger.error(f"Error processing update {update.get('update_id')}: {e}")
+            finally:
+                elapsed_ms = (time.monotonic() - started) * 1000
+                with self._lock:
+                    self._stats['busy_workers'] -= 1
+                    self._stats['processed'] += 1
+                    self._stats['total_processing_ms'] += elapsed_ms
+                    if failed:
+                        self._stats['failed'] += 1
+                self._queue.task_done()
+
+    def get_metrics(self):
+        """
+        Get a snapshot of the dispatcher's backpressure metrics.
+
+        Returns:
+            dict: Queue depth, throughput counters and wait/processing times
+        """
+        with self._lock:
+            stats = dict(self._stats)
+
+        processed = stats['processed']
+        return {
+            'queue_depth': self._queue.qsize(),
+            'max_queue_size': self.max_queue_size,
+            'workers': self.num_workers,
+            'busy_workers': stats['busy_workers'],
+            'enqueued': stats['enqueued'],
+            'rejected': stats['rejected'],
+            'processed': processed,
+            'failed': stats['failed'],
+            'max_queue_depth': stats['max_queue_depth'],
+            'avg_wait_ms': round(stats['total_wait_ms'] / processed, 2) if processed else 0.0,
+            'max_wait_ms': round(stats['max_wait_ms'], 2),
+            'avg_processing_ms': round(stats['total_processing_ms'] / processed, 2) if processed else 0.0,
+        }
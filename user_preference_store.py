@@ -0,0 +1,426 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from flask import has_app_context
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class UserPreferenceStore:
+    """Base class for storing each user's preferred language keyed by user ID."""
+
+    def get(self, user_id):
+        """
+        Get a user's language code.
+
+        Args:
+            user_id (str): The Telegram user ID
+
+        Returns:
+            str: The language code, or None if the user has no preference
+        """
+        raise NotImplementedError
+
+    def get_many(self, user_ids):
+        """
+        Get the language codes of several users at once.
+
+        Args:
+            user_ids (list): Telegram user IDs
+
+        Returns:
+            dict: {user_id: language_code} for users that have a preference
+        """
+        result = {}
+        for user_id in user_ids:
+            language_code = self.get(user_id)
+            if language_code:
+                result[user_id] = language_code
+        return result
+
+    def set(self, user_id, language_code):
+        """
+        Insert or update a user's language code.
+
+        Args:
+            user_id (str): The Telegram user ID
+            language_code (str): The language code
+        """
+        raise NotImplementedError
+
+    def set_many(self, preferences):
+        """
+        Insert or update many preferences at once.
+
+        Args:
+            preferences (dict): {user_id: language_code}
+        """
+        for user_id, language_code in preferences.items():
+            self.set(user_id, language_code)
+
+    def is_empty(self):
+        """
+        Check whether the store holds no preferences at all.
+
+        Returns:
+            bool: True if no user has a preference
+        """
+        raise NotImplementedError
+
+
+class JsonUserPreferenceStore(UserPreferenceStore):
+    """Legacy store that keeps all preferences in memory and rewrites a JSON file on every change."""
+
+    def __init__(self, data_file='user_languages.json'):
+        self.data_file = data_file
+        self.user_languages = {}
+        self._lock = threading.Lock()
+        try:
+            if os.path.exists(self.data_file) and os.path.getsize(self.data_file):
+                with open(self.data_file, 'r', encoding='utf-8') as f:
+                    self.user_languages = json.load(f)
+                logger.info(f"Loaded language preferences for {len(self.user_languages)} users")
+            else:
+                logger.info("No existing language preferences file found")
+        except Exception as e:
+            logger.error(f"Error loading user languages: {e}")
+
+    def get(self, user_id):
+        return self.user_languages.get(user_id)
+
+    def is_empty(self):
+        return not self.user_languages
+
+    def set(self, user_id, language_code):
+        with self._lock:
+            self.user_languages[user_id] = language_code
+            try:
+                with open(self.data_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.user_languages, f)
+                logger.info(f"Saved language preferences for {len(self.user_languages)} users")
+            except Exception as e:
+                logger.error(f"Error saving user languages: {e}")
+
+
+class DatabaseUserPreferenceStore(UserPreferenceStore):
+    """Store backed by the user_preferences table on the shared SQLAlchemy database."""
+
+    def __init__(self):
+        from app import app, db
+        from models import UserPreference
+        self.app = app
+        self.db = db
+        self.model = UserPreference
+
+    def _app_context(self):
+        """Use the caller's app context (and its session) when there is one, else push one."""
+        if has_app_context():
+            return nullcontext()
+        return self.app.app_context()
+
+    def get(self, user_id):
+        with self._app_context():
+            preference = self.db.session.get(self.model, user_id)
+            return preference.language_code if preference else None
+
+    def is_empty(self):
+        with self._app_context():
+            return self.db.session.query(self.model.user_id).first() is None
+
+    def get_many(self, user_ids):
+        if not user_ids:
+            return {}
+        user_ids = list(user_ids)
+        result = {}
+        with self._app_context():
+            for i in range(0, len(user_ids), 1000):
+                rows = self.model.query.filter(self.model.user_id.in_(user_ids[i:i + 1000])).all()
+                result.update((row.user_id, row.language_code) for row in rows)
+        return result
+
+    def set(self, user_id, language_code):
+        self.set_many({user_id: language_code})
+
+    def set_many(self, preferences):
+        if not preferences:
+            return
+        with self._app_context():
+            now = datetime.utcnow()
+            rows = [
+                {'user_id': user_id, 'language_code': language_code, 'updated_at': now}
+                for user_id, language_code in preferences.items()
+            ]
+            dialect = self.db.engine.dialect.name
+            if dialect in ('postgresql', 'sqlite'):
+                # Single-statement upsert keyed by the primary key
+                if dialect == 'postgresql':
+                    from sqlalchemy.dialects.postgresql import insert
+                else:
+                    from sqlalchemy.dialects.sqlite import insert
+                statement = insert(self.model.__table__).values(rows)
+                statement = statement.on_conflict_do_update(
+                    index_elements=['user_id'],
+                    set_={
+                        'language_code': statement.excluded.language_code,
+                        'updated_at': statement.excluded.updated_at
+                    }
+                )
+                self.db.session.execute(statement)
+            else:
+                for row in rows:
+                    self.db.session.merge(self.model(**row))
+            try:
+                self.db.session.commit()
+            except Exception:
+                self.db.session.rollback()
+                raise
+
+
+class SqliteUserPreferenceStore(UserPreferenceStore):
+    """Store in a local SQLite file in WAL mode, shared by all workers on the host."""
+
+    def __init__(self, db_path='user_preferences.db'):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_preferences (
+                user_id TEXT PRIMARY KEY,
+                language_code TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT language_code FROM user_preferences WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM user_preferences LIMIT 1").fetchone() is None
+
+    def get_many(self, user_ids):
+        user_ids = list(user_ids)
+        result = {}
+        # Stay below SQLite's bound parameter limit
+        for i in range(0, len(user_ids), 500):
+            chunk = user_ids[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT user_id, language_code FROM user_preferences WHERE user_id IN ({placeholders})",
+                    chunk
+                ).fetchall()
+            result.update(rows)
+        return result
+
+    def set(self, user_id, language_code):
+        self.set_many({user_id: language_code})
+
+    def set_many(self, preferences):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    """
+                    INSERT INTO user_preferences (user_id, language_code, updated_at) VALUES (?, ?, ?)
+                    ON CONFLICT (user_id) DO UPDATE SET
+                        language_code = excluded.language_code,
+                        updated_at = excluded.updated_at
+                    """,
+                    [(user_id, language_code, now) for user_id, language_code in preferences.items()]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+class CachedUserPreferenceStore(UserPreferenceStore):
+    """
+    Per-worker LRU read-through cache in front of another store.
+
+    Writes go through to the backing store and update the cache. Entries expire
+    after ttl seconds, so changes made by other workers are picked up quickly.
+    """
+
+    # Marker for users known to have no preference
+    _MISSING = object()
+
+    def __init__(self, store, max_size=10000, ttl=60):
+        self.store = store
+        self.max_size = max_size
+        self.ttl = ttl
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _cache_get(self, user_id, now):
+        entry = self._cache.get(user_id)
+        if entry is None or now - entry[1] > self.ttl:
+            return None
+        self._cache.move_to_end(user_id)
+        return entry[0]
+
+    def _cache_put(self, user_id, value, now):
+        self._cache[user_id] = (value, now)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            value = self._cache_get(user_id, now)
+            if value is not None:
+                self.hits += 1
+                return None if value is self._MISSING else value
+            self.misses += 1
+
+        language_code = self.store.get(user_id)
+        with self._lock:
+            self._cache_put(user_id, language_code or self._MISSING, now)
+        return language_code
+
+    def get_many(self, user_ids):
+        now = time.monotonic()
+        result = {}
+        missing = []
+        with self._lock:
+            for user_id in user_ids:
+                value = self._cache_get(user_id, now)
+                if value is None:
+                    missing.append(user_id)
+                elif value is not self._MISSING:
+                    result[user_id] = value
+            self.hits += len(user_ids) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            loaded = self.store.get_many(missing)
+            result.update(loaded)
+            with self._lock:
+                for user_id in missing:
+                    self._cache_put(user_id, loaded.get(user_id, self._MISSING), now)
+        return result
+
+    def is_empty(self):
+        return self.store.is_empty()
+
+    def set(self, user_id, language_code):
+        self.store.set(user_id, language_code)
+        with self._lock:
+            self._cache_put(user_id, language_code, time.monotonic())
+
+    def set_many(self, preferences):
+        self.store.set_many(preferences)
+        now = time.monotonic()
+        with self._lock:
+            for user_id, language_code in preferences.items():
+                self._cache_put(user_id, language_code, now)
+
+
+def create_user_preference_store(backend=None):
+    """
+    Create the preference store configured by the USER_PREFERENCE_STORE environment variable.
+
+    Args:
+        backend (str): 'db', 'sqlite' or 'json' (defaults to USER_PREFERENCE_STORE or 'db')
+
+    Returns:
+        UserPreferenceStore: The configured store
+    """
+    backend = (backend or os.environ.get("USER_PREFERENCE_STORE", "db")).lower()
+    if backend == 'json':
+        # The JSON store already keeps everything in memory
+        return JsonUserPreferenceStore()
+
+    if backend == 'sqlite':
+        store = SqliteUserPreferenceStore(os.environ.get("USER_PREFERENCE_DB", "user_preferences.db"))
+    else:
+        if backend != 'db':
+            logger.warning(f"Unknown user preference store backend: {backend}, using db")
+        store = DatabaseUserPreferenceStore()
+
+    logger.info(f"Using {store.__class__.__name__} for user language preferences")
+    import_legacy_preferences(store)
+    return CachedUserPreferenceStore(
+        store,
+        max_size=int(os.environ.get("USER_PREFERENCE_CACHE_SIZE", 10000)),
+        ttl=float(os.environ.get("USER_PREFERENCE_CACHE_TTL", 60))
+    )
+
+
+def import_legacy_preferences(store, json_path='user_languages.json'):
+    """
+    Import the legacy JSON preferences into a new, still empty store.
+
+    Lets a redeploy switch backends without resetting every user to the
+    default language before migrate-user-languages has been run. Users who
+    already got a preference in the store (another worker may be importing
+    at the same time) are not overwritten.
+
+    Args:
+        store (UserPreferenceStore): The configured store
+        json_path (str): Path of the legacy user_languages.json file
+
+    Returns:
+        int: The number of imported preferences
+    """
+    if not os.path.exists(json_path) or not os.path.getsize(json_path):
+        return 0
+    try:
+        if not store.is_empty():
+            return 0
+        with open(json_path, 'r', encoding='utf-8') as f:
+            preferences = {str(user_id): language_code for user_id, language_code in json.load(f).items()}
+        existing = store.get_many(list(preferences))
+        missing = {user_id: code for user_id, code in preferences.items() if user_id not in existing}
+        items = list(missing.items())
+        for i in range(0, len(items), 1000):
+            store.set_many(dict(items[i:i + 1000]))
+    except Exception as e:
+        logger.error(f"Error importing language preferences from {json_path}: {e}")
+        return 0
+
+    logger.info(f"Imported {len(items)} language preferences from {json_path} into the empty store")
+    return len(items)
+
+
+def migrate_json_preferences(store, json_path='user_languages.json', batch_size=1000):
+    """
+    Copy all preferences from the legacy JSON file into a store (safe to run repeatedly).
+
+    Args:
+        store (UserPreferenceStore): The destination store
+        json_path (str): Path of the legacy user_languages.json file
+        batch_size (int): Number of preferences written per batch
+
+    Returns:
+        int: The number of migrated preferences
+    """
+    if not os.path.exists(json_path) or not os.path.getsize(json_path):
+        logger.info(f"No preferences to migrate from {json_path}")
+        return 0
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        preferences = json.load(f)
+
+    items = [(str(user_id), language_code) for user_id, language_code in preferences.items()]
+    for i in range(0, len(items), batch_size):
+        store.set_many(dict(items[i:i + batch_size]))
+
+    logger.info(f"Migrated {len(items)} language preferences from {json_path}")
+    return len(items)